@@ -0,0 +1,104 @@
+import os
+import json
+import redis
+import redis.asyncio as aioredis
+from app.scanner import folder_and_ancestors
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/2")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "300"))
+CACHE_PREFIX = "folder-insights"
+
+_client = None
+_async_client = None
+
+def get_redis():
+    """Redis client for the cache, created on first use (one per process)."""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+    return _client
+
+def get_async_redis():
+    """asyncio Redis client for the API routes, created on first use (one per process)."""
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(REDIS_URL, socket_timeout=1, socket_connect_timeout=1)
+    return _async_client
+
+def _version_key(folder: str) -> str:
+    return f"{CACHE_PREFIX}:version:{folder}"
+
+def _stats_key(kind: str) -> str:
+    return f"{CACHE_PREFIX}:stats:{kind}"
+
+async def cached(kind: str, folder: str, params: dict, loader, ttl: int = CACHE_TTL):
+    """
+    Read-through cache for a folder-level query; `loader` is an async function returning the
+    value. The key includes the folder's version counter, so invalidate_folders makes every
+    cached entry for the folder stale at once and the old entries simply expire. Results
+    that are None are not cached. If Redis is unavailable the loader is called directly, and
+    a value that cannot be stored is still returned.
+    """
+    folder = folder.rstrip(os.sep) or os.sep
+    try:
+        client = get_async_redis()
+        version = int(await client.get(_version_key(folder)) or 0)
+        key = f"{CACHE_PREFIX}:{kind}:{folder}:{version}:{json.dumps(params, sort_keys=True)}"
+        hit = await client.get(key)
+        await client.hincrby(_stats_key(kind), "hits" if hit is not None else "misses", 1)
+    except redis.RedisError as e:
+        print(f"Cache unavailable, reading through: {e}")
+        return await loader()
+
+    if hit is not None:
+        return json.loads(hit)
+
+    value = await loader()
+    if value is not None:
+        # Round-trip through JSON so hits and misses return the same types
+        value = json.loads(json.dumps(value, default=_json_default))
+        try:
+            await client.set(key, json.dumps(value), ex=ttl)
+        except redis.RedisError as e:
+            print(f"Could not cache {kind} for {folder}: {e}")
+    return value
+
+def invalidate_folders(folders):
+    """
+    Bump the cache version of each folder and all of its ancestors, since listings and
+    counts of a folder include everything below it. Errors are logged, not raised, so a
+    Redis outage never fails the task that wrote to the database.
+    """
+    keys = {_version_key(f) for folder in folders for f in folder_and_ancestors(folder)}
+    if not keys:
+        return
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(key)
+        pipeline.execute()
+    except redis.RedisError as e:
+        print(f"Could not invalidate folder cache: {e}")
+
+def invalidate_documents(paths):
+    """Invalidate the cached insights for the folders containing the given document paths."""
+    invalidate_folders({os.path.dirname(path) for path in paths})
+
+async def get_cache_stats() -> dict:
+    """Hit and miss counters per cache kind, with the hit rate."""
+    client = get_async_redis()
+    stats = {}
+    async for key in client.scan_iter(match=_stats_key("*")):
+        kind = key.decode().rsplit(":", 1)[1]
+        counters = {k.decode(): int(v) for k, v in (await client.hgetall(key)).items()}
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        stats[kind] = {"hits": hits, "misses": misses,
+                       "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None}
+    return stats
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "keys"):
+        return dict(value)
+    raise TypeError(f"Cannot cache {type(value).__name__}")
@@ -0,0 +1,123 @@
+import os
+import threading
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # token counts fall back to a character estimate
+    tiktoken = None
+
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "1500"))
+
+_encoding_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _load_encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(TOKENIZER_ENCODING)
+    except Exception as e:
+        print(f"Falling back to estimated token counts: {e}")
+        return None
+
+def _encoding():
+    """
+    Load the tiktoken encoding once per process, or None when it is unavailable. Locked,
+    so the threads of an llm worker do not all download it (or time out) at the same time.
+    """
+    with _encoding_lock:
+        return _load_encoding()
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken, or estimate ~4 characters per token without it."""
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def _is_table(block: str) -> bool:
+    lines = block.split("\n")
+    return len(lines) >= 2 and set(lines[1].replace(" | ", "")) == {"-"}
+
+def _split_block(block: str, max_tokens: int) -> list:
+    """Split a block that is larger than `max_tokens` on row/line/word boundaries."""
+    if _is_table(block):
+        lines = block.split("\n")
+        header, rows = lines[:2], lines[2:]
+    else:
+        header, rows = [], block.split("\n") if "\n" in block else block.split(" ")
+    separator = "\n" if header or "\n" in block else " "
+
+    pieces, current = [], []
+    for row in rows:
+        if current and count_tokens(separator.join(header + current + [row])) > max_tokens:
+            pieces.append(separator.join(header + current))
+            current = []
+        current.append(row)
+    if current:
+        pieces.append(separator.join(header + current))
+
+    # A single line or word that is still too big is cut on characters as a last resort
+    result = []
+    for piece in pieces:
+        if count_tokens(piece) > max_tokens and separator == "\n":
+            result.extend(_split_block(piece.replace("\n", " "), max_tokens))
+        elif count_tokens(piece) > max_tokens:
+            step = max_tokens * 4
+            result.extend(piece[i:i + step] for i in range(0, len(piece), step))
+        else:
+            result.append(piece)
+    return result
+
+def _sections(text: str) -> list:
+    """Split extracted document text into (heading, blocks) sections at `## ` headings."""
+    sections = [(None, [])]
+    for block in text.split("\n\n"):
+        block = block.strip("\n")
+        if not block:
+            continue
+        if block.startswith("## "):
+            heading, _, rest = block.partition("\n")
+            sections.append((heading, [heading]))
+            if rest.strip():
+                sections[-1][1].append(rest.strip("\n"))
+        else:
+            sections[-1][1].append(block)
+    return [section for section in sections if section[1]]
+
+def chunk_text(text: str, max_tokens: int = CHUNK_MAX_TOKENS) -> list:
+    """
+    Split the markdown-ish output of extract_text_from_docx into chunks of at most
+    `max_tokens`. Chunks break on heading, table and paragraph boundaries; tables are only
+    split between rows (repeating their header), and a section continued in a new chunk
+    is prefixed with its heading.
+    """
+    chunks, current, used = [], [], 0
+
+    def flush():
+        nonlocal current, used
+        if current:
+            chunks.append("\n\n".join(current))
+        current, used = [], 0
+
+    for heading, blocks in _sections(text):
+        section_tokens = sum(count_tokens(block) for block in blocks)
+        if current and used + section_tokens > max_tokens and section_tokens <= max_tokens:
+            flush()  # keep a section that fits in one chunk together
+
+        # Leave room for the heading that is repeated when the section spans several chunks
+        budget = max_tokens - count_tokens(heading) - 1 if heading else max_tokens
+        for block in blocks:
+            pieces = [block] if count_tokens(block) <= budget else _split_block(block, budget)
+            for piece in pieces:
+                piece_tokens = count_tokens(piece)
+                if current and used + piece_tokens > max_tokens:
+                    flush()
+                    if heading and piece != heading:
+                        current, used = [heading], count_tokens(heading) + 1
+                current.append(piece)
+                used += piece_tokens + 1  # blank line joining the pieces
+    flush()
+    return chunks
@@ -0,0 +1,102 @@
+import os
+import random
+import re
+from functools import lru_cache
+from typing import NamedTuple
+import numpy as np
+
+# The best tag is trusted when its keyword evidence reaches PRECLASSIFIER_MIN_EVIDENCE and
+# it holds at least PRECLASSIFIER_MIN_SHARE of the evidence of all tags; tune both with
+# /document-classification/preclassifier_metrics
+PRECLASSIFIER_MIN_EVIDENCE = float(os.getenv("PRECLASSIFIER_MIN_EVIDENCE", "6.0"))
+PRECLASSIFIER_MIN_SHARE = float(os.getenv("PRECLASSIFIER_MIN_SHARE", "0.6"))
+# Fraction of confident documents that are still sent to the LLM to measure agreement
+PRECLASSIFIER_SHADOW_RATE = float(os.getenv("PRECLASSIFIER_SHADOW_RATE", "0.05"))
+PRECLASSIFIER_ENABLED = os.getenv("PRECLASSIFIER_ENABLED", "1") == "1"
+# Title and headings say most about the kind of document, so they count this many times
+HEADING_WEIGHT = 3
+MAX_BODY_CHARS = 20000
+
+# Keyword stems (Dutch and English) for the seeded tags. A document word matches a stem it
+# starts with, so "risico" also matches "risicoanalyse". Tags without an entry are matched
+# on the words of their name only.
+TAG_KEYWORDS = {
+    "Internal Policy": "beleid reglement richtlijn gedragscode procedure regeling policy guideline conduct",
+    "Meeting Notes": "notulen vergadering verslag agenda aanwezig afwezig actiepunt besluit rondvraag meeting minutes attendees",
+    "Project Documentation": "project aanpak mijlpaal planning scope opdracht deliverable milestone",
+    "Training Materials": "training cursus opleiding workshop handleiding module oefening leerdoel instructie course tutorial",
+    "Performance Reviews": "beoordeling functionering functioneren medewerker doelen ontwikkeling evaluatie performance review",
+    "Financial Reports": "jaarrekening jaarverslag financi omzet winst verlies balans begroting kosten kasstroom boekjaar revenue budget",
+    "HR Documents": "personeel arbeidsovereenkomst verlof salaris sollicitatie vacature ziekteverzuim aanstelling employment",
+    "Technical Documentation": "technisch specificatie architectuur systeem installatie configuratie software technical",
+    "Research & Development": "onderzoek innovatie experiment hypothese prototype analyse resultaten research development",
+    "Compliance": "compliance wetgeving avg privacy audit naleving toezicht regelgeving gdpr certificering",
+    "Internal Communications": "nieuwsbrief mededeling aankondiging bericht communicatie memo announcement newsletter",
+    "Feedback & Surveys": "enquête vragenlijst feedback tevredenheid respondent survey questionnaire",
+    "Strategic Planning": "strategie strategisch visie missie doelstelling meerjarenplan koers roadmap strategic",
+    "Risk Management": "risico maatregel beheersing continuïteit mitigatie risk mitigation",
+}
+MIN_STEM_LENGTH = 3
+
+_TOKEN = re.compile(r"\w+")
+
+class Classification(NamedTuple):
+    tags: list
+    confidence: float  # share of all keyword evidence held by the best tag
+    evidence: float    # idf-weighted keyword evidence of the best tag
+    confident: bool
+
+def _stems(tag: str) -> set:
+    words = _TOKEN.findall(f"{tag} {TAG_KEYWORDS.get(tag, '')}".lower())
+    return {word for word in words if len(word) >= MIN_STEM_LENGTH}
+
+@lru_cache(maxsize=8)
+def _keyword_matrix(tags: tuple):
+    """
+    Tag x stem matrix weighted by inverse tag frequency, so stems shared by several tags
+    count for less. Cached per tag vocabulary.
+    """
+    stems = sorted({stem for tag in tags for stem in _stems(tag)})
+    index = {stem: i for i, stem in enumerate(stems)}
+    matrix = np.zeros((len(tags), len(stems)), dtype=np.float32)
+    for row, tag in enumerate(tags):
+        for stem in _stems(tag):
+            matrix[row, index[stem]] = 1.0
+    idf = np.log((len(tags) + 1) / matrix.sum(axis=0))
+    return index, matrix * idf
+
+def _weighted_tokens(text: str) -> list:
+    """Words of extracted document text, with the title and headings repeated."""
+    headings = [line for line in text.split("\n") if line.startswith("#")]
+    return _TOKEN.findall(("\n".join(headings) + "\n") * HEADING_WEIGHT + text[:MAX_BODY_CHARS])
+
+def classify(text: str, tags: list) -> Classification:
+    """
+    Score a document against the keyword stems of each tag (sublinear term frequency times
+    inverse tag frequency) and return the best tag. Miscellaneous is never assigned
+    locally, since it has no keywords to match.
+    """
+    candidates = tuple(sorted(tag for tag in tags if tag != "Miscellaneous"))
+    if not text.strip() or not candidates:
+        return Classification([], 0.0, 0.0, False)
+
+    index, matrix = _keyword_matrix(candidates)
+    counts = np.zeros(len(index), dtype=np.float32)
+    for token in _weighted_tokens(text):
+        token = token.lower()
+        for length in range(MIN_STEM_LENGTH, len(token) + 1):
+            column = index.get(token[:length])
+            if column is not None:
+                counts[column] += 1
+    scores = matrix @ np.where(counts > 0, 1 + np.log(np.maximum(counts, 1)), 0)
+
+    best = int(np.argmax(scores))
+    total = float(scores.sum())
+    evidence = float(scores[best])
+    share = evidence / total if total else 0.0
+    confident = evidence >= PRECLASSIFIER_MIN_EVIDENCE and share >= PRECLASSIFIER_MIN_SHARE
+    return Classification([candidates[best]] if evidence else [], round(share, 4), round(evidence, 4), confident)
+
+def should_shadow() -> bool:
+    """Whether a confidently classified document is also sent to the LLM, to measure agreement."""
+    return random.random() < PRECLASSIFIER_SHADOW_RATE
@@ -0,0 +1,119 @@
+"""
+Async counterparts of the app.db queries used by the API routes, on an asyncpg engine so a
+slow query does not block the event loop. Celery workers keep using the sync engine in app.db.
+"""
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+import os
+import sys
+from app.db import (DB_URL, DOCUMENTS_METADATA_PAGE_SQL, JOBS_SQL, CHUNKS_BY_VECTOR_ROWS_SQL, DUPLICATE_CLUSTERS_SQL,
+                    FULL_TEXT_SEARCH_SQL, page_params, subtree_params, chunks_by_vector_rows_params,
+                    full_text_search_params)
+from app.metrics import count_queries, instrument_db_module
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+async_engine = create_async_engine(
+    DB_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=True,
+)
+event.listen(async_engine.sync_engine, "before_cursor_execute", count_queries)
+
+async def create_job(status="pending", result=None, kind=None):
+    """Create a new job and return its ID."""
+    async with async_engine.begin() as connection:
+        result = await connection.execute(
+            text("INSERT INTO jobs (status, result, kind) VALUES (:status, :result, :kind) RETURNING id"),
+            {"status": status, "result": result, "kind": kind}
+        )
+        return result.scalar()
+
+async def get_jobs(job_ids):
+    """Retrieve several jobs in one query, with the progress counters of their child jobs."""
+    async with async_engine.connect() as connection:
+        result = await connection.execute(JOBS_SQL, {"job_ids": list(job_ids)})
+        return result.mappings().all()
+
+async def get_folder_count(path):
+    """Retrieve the document count for a folder."""
+    async with async_engine.connect() as connection:
+        result = await connection.execute(
+            text("SELECT doc_count FROM folders WHERE path = :path"),
+            {"path": path}
+        )
+        row = result.mappings().fetchone()
+        return row["doc_count"] if row else None
+
+async def get_documents_metadata_in_folder(path, limit=10, after=None):
+    """
+    Retrieve documents in a folder tree with their metadata and tags, most recently modified
+    first. Pass the (modified, id) of the last row of a page as `after` to get the next page.
+    """
+    async with async_engine.connect() as connection:
+        result = await connection.execute(DOCUMENTS_METADATA_PAGE_SQL, page_params(path, limit, after))
+        return result.mappings().all()
+
+async def get_duplicate_clusters_in_folder(path, limit=50, after=0):
+    """
+    Retrieve the members of up to `limit` duplicate clusters with a document below a folder,
+    ordered by cluster (the ID of its leading document). Pass the last cluster ID as `after`
+    to get the next page.
+    """
+    async with async_engine.connect() as connection:
+        result = await connection.execute(DUPLICATE_CLUSTERS_SQL, {**subtree_params(path), "limit": limit, "after": after})
+        return result.mappings().all()
+
+async def get_chunks_by_vector_rows(vector_rows, folder=None):
+    """Retrieve the document chunks stored at the given vector index rows, optionally only below `folder`."""
+    async with async_engine.connect() as connection:
+        result = await connection.execute(CHUNKS_BY_VECTOR_ROWS_SQL, chunks_by_vector_rows_params(vector_rows, folder))
+        return result.mappings().all()
+
+async def search_documents_full_text(query, limit=10, after=None, folder=None, tag=None):
+    """
+    Documents matching a web-style search query (quoted phrases, OR, -word), best first, with
+    a snippet of the matching text. Pass the (rank, id) of the last row of a page as `after`.
+    """
+    async with async_engine.connect() as connection:
+        result = await connection.execute(FULL_TEXT_SEARCH_SQL, full_text_search_params(query, limit, after, folder, tag))
+        return result.mappings().all()
+
+async def get_preclassifier_metrics(days=30):
+    """LLM avoidance and LLM agreement of the local pre-classifier over the last `days` days."""
+    async with async_engine.connect() as connection:
+        result = await connection.execute(
+            text("""
+                SELECT COUNT(*) AS documents,
+                       COUNT(*) FILTER (WHERE llm_tags IS NULL) AS llm_avoided,
+                       COUNT(*) FILTER (WHERE confident AND llm_tags IS NOT NULL) AS shadowed,
+                       COUNT(*) FILTER (WHERE confident AND local_tags <@ llm_tags) AS shadow_agreed,
+                       COUNT(*) FILTER (WHERE NOT confident AND cardinality(local_tags) > 0
+                                        AND llm_tags IS NOT NULL) AS ambiguous,
+                       COUNT(*) FILTER (WHERE NOT confident AND cardinality(local_tags) > 0
+                                        AND local_tags <@ llm_tags) AS ambiguous_agreed
+                FROM preclassifier_results
+                WHERE created_at > NOW() - make_interval(days => :days)"""),
+            {"days": days}
+        )
+        return result.mappings().one()
+
+async def get_llm_cache_stats():
+    """Hit and miss counters and the number of cached responses per LLM cache kind."""
+    async with async_engine.connect() as connection:
+        result = await connection.execute(
+            text("""
+                SELECT s.kind, s.hits, s.misses, COALESCE(c.entries, 0) AS entries
+                FROM llm_cache_stats s
+                LEFT JOIN (SELECT kind, COUNT(*) AS entries FROM llm_cache GROUP BY kind) c ON c.kind = s.kind
+                ORDER BY s.kind""")
+        )
+        return result.mappings().all()
+
+instrument_db_module(sys.modules[__name__])
@@ -0,0 +1,67 @@
+import os
+import re
+import zlib
+from functools import lru_cache
+import numpy as np
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # embeddings fall back to the hashing vectorizer
+    SentenceTransformer = None
+
+# A local sentence-transformers model name (e.g. "paraphrase-multilingual-MiniLM-L12-v2") or
+# empty for the dependency-free hashing vectorizer
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+
+_TOKEN = re.compile(r"\w+")
+
+@lru_cache(maxsize=1)
+def _model():
+    """Load the sentence-transformers model once per process, or None to use hashing."""
+    if not EMBEDDING_MODEL or SentenceTransformer is None:
+        return None
+    try:
+        return SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    except Exception as e:
+        print(f"Falling back to hashed embeddings: {e}")
+        return None
+
+def embedding_name() -> str:
+    """Identifies the embedding space; vectors from different spaces cannot be compared."""
+    model = _model()
+    return EMBEDDING_MODEL if model is not None else f"hashing-{EMBEDDING_DIM}"
+
+def embedding_dim() -> int:
+    model = _model()
+    return model.get_sentence_embedding_dimension() if model is not None else EMBEDDING_DIM
+
+def _hashed(text: str, dim: int) -> np.ndarray:
+    """
+    Signed feature hashing of word unigrams and bigrams with sublinear term frequency.
+    crc32 keeps the buckets stable across processes, unlike hash().
+    """
+    tokens = _TOKEN.findall(text.lower())
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    counts = {}
+    for feature in features:
+        h = zlib.crc32(feature.encode())
+        key = (h % dim, 1.0 if h & 0x80000000 else -1.0)
+        counts[key] = counts.get(key, 0) + 1
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for (bucket, sign), count in counts.items():
+        vector[bucket] += sign * (1.0 + np.log(count))
+    return vector
+
+def embed_texts(texts: list) -> np.ndarray:
+    """Embed texts as rows of an L2-normalized float32 matrix, so dot products are cosine similarities."""
+    model = _model()
+    if model is not None:
+        return model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE, normalize_embeddings=True,
+                            convert_to_numpy=True).astype(np.float32)
+
+    vectors = np.stack([_hashed(text, EMBEDDING_DIM) for text in texts]) if texts else np.zeros((0, EMBEDDING_DIM), np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import redis
+import redis.asyncio as aioredis
+from app.cache import REDIS_URL, get_redis
+
+JOB_CHANNEL_PREFIX = "jobs:"
+TERMINAL_STATUSES = {"done", "failed"}
+
+def publish_job_update(job_id: int, status: str, result=None, parent_id=None):
+    """
+    Publish a job status change to Redis pub/sub. Publishing is best effort: a missed
+    event only delays a client until its next snapshot, so errors are logged, not raised.
+    """
+    message = json.dumps({"id": job_id, "status": status, "result": result, "parent_id": parent_id})
+    try:
+        get_redis().publish(f"{JOB_CHANNEL_PREFIX}{job_id}", message)
+    except redis.RedisError as e:
+        print(f"Could not publish update for job {job_id}: {e}")
+
+class JobEventHub:
+    """
+    Fan job updates out to the clients of this API process. A single pattern subscription
+    on Redis feeds one asyncio queue per watching client, so the number of watchers does
+    not add Redis connections or database queries.
+    """
+    def __init__(self, url: str = REDIS_URL):
+        self.url = url
+        self.watchers = {}  # job_id -> set of asyncio.Queue
+        self._listener = None
+
+    def subscribe(self, job_ids) -> asyncio.Queue:
+        """Return a queue that receives the updates of `job_ids` and their child jobs until unsubscribed."""
+        queue = asyncio.Queue(maxsize=1000)
+        for job_id in job_ids:
+            self.watchers.setdefault(job_id, set()).add(queue)
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        return queue
+
+    def unsubscribe(self, job_ids, queue: asyncio.Queue):
+        for job_id in job_ids:
+            queues = self.watchers.get(job_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.watchers[job_id]
+
+    async def _listen(self):
+        while True:
+            client = aioredis.Redis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(f"{JOB_CHANNEL_PREFIX}*")
+                    async for message in pubsub.listen():
+                        if message["type"] != "pmessage":
+                            continue
+                        try:
+                            self._dispatch(json.loads(message["data"]))
+                        except Exception as e:  # one malformed update must not stop the others
+                            print(f"Skipping job update {message['data']!r}: {e}")
+            except Exception as e:
+                print(f"Job event subscription lost, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+    def _dispatch(self, update: dict):
+        # Watchers of a parent job also receive its children's updates, as progress
+        queues = self.watchers.get(update["id"], set()) | self.watchers.get(update.get("parent_id"), set())
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()  # a stalled client skips older updates but still gets the latest
+            queue.put_nowait(update)
+
+hub = JobEventHub()
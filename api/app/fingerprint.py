@@ -0,0 +1,38 @@
+import hashlib
+import os
+import re
+import numpy as np
+
+# Documents whose SimHashes differ in at most this many bits are near-duplicates. The
+# 64 bits are split into SIMHASH_BANDS bands and candidates are found by an exact band
+# match, which finds every pair within SIMHASH_BANDS - 1 bits (pigeonhole) and most pairs
+# a few bits further apart. A one-paragraph edit moves a document 0-12 bits, unrelated
+# documents are more than 12 bits apart; more bands would make most pairs candidates.
+DUPLICATE_MAX_DISTANCE = int(os.getenv("DUPLICATE_MAX_DISTANCE", "12"))
+SIMHASH_BANDS = 8
+SHINGLE_WORDS = 3
+
+_WORD = re.compile(r"\w+")
+
+def simhash(text: str) -> int | None:
+    """
+    64-bit SimHash of the word 3-shingles of a text, as a signed integer (a Postgres
+    BIGINT). Small edits flip few bits, unrelated texts differ in about half of them.
+    None for texts too short to fingerprint.
+    """
+    words = _WORD.findall(text.lower())
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    if not shingles:
+        return None
+    digests = b"".join(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in shingles)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1)
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int(np.packbits(votes).view(">i8")[0])
+
+def hamming_distance(a: int, b: int) -> int:
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+def simhash_bands(value: int) -> list:
+    """The SimHash bands of a value, each tagged with its position; db.simhash_bands_sql in Python."""
+    bits = 64 // SIMHASH_BANDS
+    return [band << bits | ((value >> band * bits) & ((1 << bits) - 1)) for band in range(SIMHASH_BANDS)]
@@ -0,0 +1,424 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import httpx
+import openai
+from openai import AsyncOpenAI
+from app.chunking import CHUNK_MAX_TOKENS, chunk_text, count_tokens
+from app.db import get_chunk_summaries, store_chunk_summaries
+from app.metrics import current_task_name, with_llm_task, observe_llm_request, observe_llm_retry
+
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+# Prompt plus expected answer tokens of a packed analysis batch
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "6000"))
+# Completion tokens the model can return in one answer; a batch never asks for more
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "4096"))
+LLM_SINGLE_PASS_TOKENS = int(os.getenv("LLM_SINGLE_PASS_TOKENS", "12000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "3500"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "90000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+SUMMARY_MAX_TOKENS = 150
+ANALYSIS_MAX_TOKENS = SUMMARY_MAX_TOKENS + 50  # answer tokens per analyzed document: summary plus tags
+LLM_BATCH_MAX_DOCUMENTS = max(1, min(int(os.getenv("LLM_BATCH_MAX_DOCUMENTS", "10")),
+                                     LLM_MAX_OUTPUT_TOKENS // ANALYSIS_MAX_TOKENS))
+CHUNK_SUMMARY_MAX_TOKENS = 300
+# Bump a version when its prompt or response format changes, so cached responses are not reused
+TAG_PROMPT_VERSION = 1
+SUMMARY_PROMPT_VERSION = 1
+ANALYZE_PROMPT_VERSION = 1
+CHUNK_SUMMARY_PROMPT_VERSION = 1
+
+TAG_SYSTEM_PROMPT = (
+    "You are an expert document classifier. "
+    "Given the content of a document, assign the most relevant tags "
+    "from the provided list. Only select tags that are clearly applicable."
+)
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You are an expert document summarizer. "
+    "Given the content of a document, provide a concise summary "
+    "highlighting the key points. "
+    "Make sure you write the summary only in Dutch. "
+    "Do not add any prefixes or suffixes to the summary."
+)
+
+CHUNK_SUMMARY_SYSTEM_PROMPT = (
+    "You are an expert document summarizer. "
+    "You are given one section of a longer document. Summarize the key points, facts, "
+    "figures and obligations of this section so they can be combined with the summaries "
+    "of the other sections. Write the summary only in Dutch."
+)
+
+ANALYZE_SYSTEM_PROMPT = (
+    "You are an expert document classifier and summarizer. "
+    "Given the content of a document, assign the most relevant tags "
+    "from the provided list. Only select tags that are clearly applicable. "
+    "Also provide a concise summary highlighting the key points. "
+    "Make sure you write the summary only in Dutch. "
+    "Do not add any prefixes or suffixes to the summary."
+)
+
+# -- rate limiting --
+
+class AdaptiveRateLimiter:
+    """
+    Token buckets for requests and tokens per minute, shared by all LLM calls of a process.
+    A 429 halves both rates and pauses all callers for the server's retry-after; every
+    success then raises the rates again step by step up to the configured limits.
+    """
+    BURST_SECONDS = 10
+    MIN_RATE_FRACTION = 0.05
+    RECOVERY_FRACTION = 0.02
+
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int):
+        self.max_rpm, self.max_tpm = rpm, tpm
+        self.rpm, self.tpm = float(rpm), float(tpm)
+        self.concurrency = asyncio.Semaphore(max_concurrency)
+        self.rate_limited = 0
+        self._requests = self._request_capacity()
+        self._tokens = self._token_capacity()
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _request_capacity(self) -> float:
+        return max(1.0, self.rpm / 60 * self.BURST_SECONDS)
+
+    def _token_capacity(self) -> float:
+        return max(1.0, self.tpm / 60 * self.BURST_SECONDS)
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self._request_capacity(), self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self._token_capacity(), self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int):
+        """Wait until one request and `tokens` tokens fit in the current budget, then take them."""
+        async with self._lock:  # waiters are served in arrival order
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    tokens_needed = min(tokens, self._token_capacity())  # huge requests must still pass
+                    if self._requests >= 1 and self._tokens >= tokens_needed:
+                        self._requests -= 1
+                        self._tokens -= tokens_needed
+                        return
+                    wait = max((1 - self._requests) * 60 / self.rpm,
+                               (tokens_needed - self._tokens) * 60 / self.tpm)
+                await asyncio.sleep(wait)
+
+    def record_usage(self, estimated: int, actual: int):
+        """Correct the token bucket once the real token usage of a request is known."""
+        self._tokens = min(self._token_capacity(), self._tokens + estimated - actual)
+
+    def on_success(self):
+        self.rpm = min(self.max_rpm, self.rpm + self.max_rpm * self.RECOVERY_FRACTION)
+        self.tpm = min(self.max_tpm, self.tpm + self.max_tpm * self.RECOVERY_FRACTION)
+
+    def on_rate_limited(self, retry_after: float):
+        self.rate_limited += 1
+        self.rpm = max(self.max_rpm * self.MIN_RATE_FRACTION, self.rpm / 2)
+        self.tpm = max(self.max_tpm * self.MIN_RATE_FRACTION, self.tpm / 2)
+        self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+# -- shared event loop and client --
+
+_state_lock = threading.Lock()
+_state = {"pid": None, "loop": None, "client": None, "limiter": None}
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return this process's LLM event loop, running in a background thread. It is created
+    lazily and re-created after a fork, so each prefork worker child gets its own loop,
+    connection pool and rate limiter.
+    """
+    with _state_lock:
+        if _state["pid"] != os.getpid():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-event-loop", daemon=True).start()
+            _state.update(pid=os.getpid(), loop=loop, client=None, limiter=None)
+        return _state["loop"]
+
+def get_async_client() -> AsyncOpenAI:
+    """Shared AsyncOpenAI client with a pooled HTTP connection; only use it on the LLM event loop."""
+    if _state["client"] is None:
+        _state["client"] = AsyncOpenAI(
+            max_retries=0,  # retries and 429 back-off are handled by acomplete
+            timeout=LLM_TIMEOUT,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=LLM_MAX_CONCURRENCY,
+                                    max_keepalive_connections=LLM_MAX_CONCURRENCY),
+                timeout=LLM_TIMEOUT,
+            ),
+        )
+    return _state["client"]
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """Rate limiter shared by all LLM calls of this process; only use it on the LLM event loop."""
+    if _state["limiter"] is None:
+        _state["limiter"] = AdaptiveRateLimiter(LLM_RPM_LIMIT, LLM_TPM_LIMIT, LLM_MAX_CONCURRENCY)
+    return _state["limiter"]
+
+def run_async(coro):
+    """Run a coroutine on the shared LLM event loop from synchronous code and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(with_llm_task(current_task_name(), coro), _event_loop()).result()
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Delay before retrying: the server's retry-after when given, else jittered exponential back-off."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1)):
+            try:
+                return float(response.headers[header]) * scale
+            except (KeyError, ValueError):
+                continue
+    return min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+async def acomplete(request: dict) -> str:
+    """
+    Send one chat completion request through the shared client, within the rate limits,
+    and return the message content. Rate-limit, timeout, connection and server errors are
+    retried up to LLM_MAX_RETRIES times.
+    """
+    client, limiter = get_async_client(), get_rate_limiter()
+    estimated = sum(count_tokens(m["content"]) for m in request["messages"]) + request.get("max_tokens", 0)
+
+    started = time.perf_counter()
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        await limiter.acquire(estimated)
+        try:
+            async with limiter.concurrency:
+                response = await client.chat.completions.create(**request)
+        except openai.RateLimitError as e:
+            if attempt == LLM_MAX_RETRIES:
+                observe_llm_request(time.perf_counter() - started, "rate_limited")
+                raise
+            observe_llm_retry("rate_limited")
+            limiter.on_rate_limited(_retry_delay(e, attempt))
+            continue
+        except (openai.APIConnectionError, openai.InternalServerError) as e:
+            if attempt == LLM_MAX_RETRIES:
+                observe_llm_request(time.perf_counter() - started, "error")
+                raise
+            observe_llm_retry(type(e).__name__)
+            await asyncio.sleep(_retry_delay(e, attempt))
+            continue
+
+        limiter.on_success()
+        if response.usage is not None:
+            limiter.record_usage(estimated, response.usage.total_tokens)
+        observe_llm_request(time.perf_counter() - started, "ok", response.usage)
+        return response.choices[0].message.content
+
+def complete(request: dict) -> str:
+    """Synchronous wrapper around acomplete for use in Celery tasks."""
+    return run_async(acomplete(request))
+
+# -- requests --
+
+def _tag_request(text: str, tags: list) -> dict:
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": TAG_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    f"Document Content:\n{text}\n\n"
+                    f"Available Tags: {', '.join(tags)}\n\n"
+                    "Return the tags as a JSON array."
+                )
+            }
+        ],
+        "max_tokens": 150,
+        "temperature": 0,
+    }
+
+def _summary_request(text: str) -> dict:
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Document Content:\n{text}\n\nProvide a concise summary."}
+        ],
+        "max_tokens": SUMMARY_MAX_TOKENS,
+        "temperature": 0,
+    }
+
+def _chunk_summary_request(chunk: str) -> dict:
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": CHUNK_SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Document Section:\n{chunk}"}
+        ],
+        "max_tokens": CHUNK_SUMMARY_MAX_TOKENS,
+        "temperature": 0,
+    }
+
+def _analyze_request(text: str, tags: list) -> dict:
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": ANALYZE_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    f"Document Content:\n{text}\n\n"
+                    f"Available Tags: {', '.join(tags)}\n\n"
+                    'Return a JSON object of the form {"tags": [...], "summary": "..."}.'
+                )
+            }
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": ANALYSIS_MAX_TOKENS,
+        "temperature": 0,
+    }
+
+def _analyze_batch_request(documents: list, tags: list) -> dict:
+    content = "\n\n".join(
+        f"=== Document {document_id} ===\n{text}" for document_id, text in documents
+    )
+    return {
+        "model": LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": ANALYZE_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": (
+                    f"{content}\n\n"
+                    f"Available Tags: {', '.join(tags)}\n\n"
+                    "Analyze every document separately. Return a JSON object of the form "
+                    '{"documents": [{"id": <document number>, "tags": [...], "summary": "..."}]}.'
+                )
+            }
+        ],
+        "response_format": {"type": "json_object"},
+        "max_tokens": min(ANALYSIS_MAX_TOKENS * len(documents), LLM_MAX_OUTPUT_TOKENS),
+        "temperature": 0,
+    }
+
+def _parse_analysis(item: dict) -> dict:
+    """Normalize one analysis object from the model into {"tags": [...], "summary": str}."""
+    tags = item.get("tags") or []
+    if isinstance(tags, str):
+        tags = [tags]
+    return {"tags": [str(tag) for tag in tags], "summary": str(item.get("summary") or "").strip()}
+
+# -- tagging and analysis --
+
+def tag_document(text: str, tags: list) -> list:
+    """Return the tags the model assigns to a document."""
+    return json.loads(complete(_tag_request(text, tags)))
+
+def analyze_document(text: str, tags: list) -> dict:
+    """Tag and summarize one document in a single structured completion."""
+    return _parse_analysis(json.loads(complete(_analyze_request(text, tags))))
+
+async def _analyze_batch(documents: list, tags: list) -> dict:
+    """
+    Tag and summarize (document_id, text) pairs in one completion. Documents the model left
+    out of its answer, or all of them when the answer is not valid JSON (cut off at
+    max_tokens), are retried with single-document requests. Documents whose single answer
+    cannot be parsed either are left out of the results.
+    """
+    results = {}
+    if len(documents) > 1:
+        try:
+            content = json.loads(await acomplete(_analyze_batch_request(documents, tags)))
+        except json.JSONDecodeError:
+            observe_llm_retry("invalid_batch")
+            content = {}
+        items = content.get("documents", []) if isinstance(content, dict) else []
+        for item in items if isinstance(items, list) else []:
+            try:
+                results[int(item["id"])] = _parse_analysis(item)
+            except (KeyError, TypeError, ValueError):
+                continue
+
+    missing = [(document_id, text) for document_id, text in documents if document_id not in results]
+    answers = await asyncio.gather(*(acomplete(_analyze_request(text, tags)) for _, text in missing))
+    for (document_id, _), answer in zip(missing, answers):
+        try:
+            results[document_id] = _parse_analysis(json.loads(answer))
+        except (json.JSONDecodeError, AttributeError, TypeError) as e:
+            print(f"Could not parse the analysis of document {document_id}: {e}")
+    return results
+
+def analyze_batches(batches: list, tags: list) -> dict:
+    """Run packed batches of (document_id, text) pairs concurrently; returns {document_id: analysis}."""
+    async def run():
+        analyses = {}
+        for results in await asyncio.gather(*(_analyze_batch(batch, tags) for batch in batches)):
+            analyses.update(results)
+        return analyses
+    return run_async(run())
+
+def pack_documents(documents: list, token_budget: int = LLM_BATCH_TOKEN_BUDGET,
+                   max_documents: int = LLM_BATCH_MAX_DOCUMENTS) -> list:
+    """
+    Greedily pack (document_id, text) pairs into batches of at most `max_documents` whose
+    estimated prompt and answer size stays within `token_budget`. A document larger than
+    the budget gets a batch of its own.
+    """
+    batches, current, used = [], [], 0
+    for document_id, text in sorted(documents, key=lambda d: len(d[1])):
+        tokens = count_tokens(text) + ANALYSIS_MAX_TOKENS
+        if current and (used + tokens > token_budget or len(current) >= max_documents):
+            batches.append(current)
+            current, used = [], 0
+        current.append((document_id, text))
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+# -- summarization --
+
+def summarize(text: str) -> str:
+    """Summarize text that fits in a single prompt."""
+    return complete(_summary_request(text))
+
+def summarize_chunks(chunks: list) -> list:
+    """
+    Summarize chunks concurrently (map step). Summaries are cached by chunk hash, so after
+    an edit only the chunks whose content changed are sent to the model again.
+    """
+    hashes = [hashlib.sha256(chunk.encode("utf-8")).hexdigest() for chunk in chunks]
+    cached = get_chunk_summaries(set(hashes), LLM_MODEL, CHUNK_SUMMARY_PROMPT_VERSION)
+
+    missing = {h: chunk for h, chunk in zip(hashes, chunks) if h not in cached}
+    if missing:
+        async def run():
+            return await asyncio.gather(*(acomplete(_chunk_summary_request(chunk)) for chunk in missing.values()))
+        summaries = dict(zip(missing, run_async(run())))
+        store_chunk_summaries(summaries, LLM_MODEL, CHUNK_SUMMARY_PROMPT_VERSION)
+        cached.update(summaries)
+
+    return [cached[h] for h in hashes]
+
+def condense_text(text: str, max_tokens: int = LLM_SINGLE_PASS_TOKENS) -> str:
+    """
+    Return `text` unchanged if it fits in one prompt, otherwise replace it by its chunk
+    summaries, repeating until the combined summaries fit (reduce input).
+    """
+    while count_tokens(text) > max_tokens:
+        chunks = chunk_text(text, CHUNK_MAX_TOKENS)
+        condensed = "\n\n".join(summarize_chunks(chunks))
+        if count_tokens(condensed) >= count_tokens(text):
+            break  # summaries no longer shrink the text; let the final prompt handle it
+        text = condensed
+    return text
+
+def summarize_text(text: str) -> str:
+    """Summarize a document of any length: map over chunks when needed, then reduce in one call."""
+    return summarize(condense_text(text))
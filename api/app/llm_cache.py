@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+from app.db import get_llm_cache_entries, store_llm_cache_entries, record_llm_cache_lookups
+from app.llm import (LLM_MODEL, TAG_PROMPT_VERSION, SUMMARY_PROMPT_VERSION, ANALYZE_PROMPT_VERSION,
+                     CHUNK_SUMMARY_PROMPT_VERSION)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000000"))
+LLM_CACHE_MAX_AGE_DAYS = int(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "90"))
+
+PROMPT_VERSIONS = {
+    "tag": TAG_PROMPT_VERSION,
+    "summary": SUMMARY_PROMPT_VERSION,
+    "analyze": ANALYZE_PROMPT_VERSION,
+}
+
+def vocabulary_hash(tags) -> str:
+    """Hash of the tag vocabulary; adding, removing or renaming a tag changes it."""
+    return hashlib.sha256("\n".join(sorted(tags or [])).encode("utf-8")).hexdigest()
+
+def cache_key(kind: str, content_hash: str, tags=None) -> str:
+    """
+    Key of a cached LLM response: the kind of call, model, prompt versions (long documents
+    are condensed with the chunk summary prompt first), tag vocabulary and the document's
+    content hash. File names and folders are not part of it, so copies share a response.
+    """
+    parts = [kind, LLM_MODEL, str(PROMPT_VERSIONS[kind]), str(CHUNK_SUMMARY_PROMPT_VERSION),
+             vocabulary_hash(tags), content_hash]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+def lookup(kind: str, content_hashes, tags=None) -> dict:
+    """Return {content_hash: response} for the documents whose response is cached."""
+    content_hashes = {h for h in content_hashes if h}
+    if not LLM_CACHE_ENABLED or not content_hashes:
+        return {}
+    keys = {cache_key(kind, h, tags): h for h in content_hashes}
+    found = get_llm_cache_entries(keys)
+    record_llm_cache_lookups(kind, len(found), len(content_hashes) - len(found))
+    return {keys[key]: json.loads(response) for key, response in found.items()}
+
+def store(kind: str, responses: dict, tags=None):
+    """Cache responses given as {content_hash: response}; responses must be JSON serializable."""
+    responses = {h: response for h, response in responses.items() if h}
+    if not LLM_CACHE_ENABLED or not responses:
+        return
+    store_llm_cache_entries({cache_key(kind, h, tags): (h, json.dumps(response)) for h, response in responses.items()},
+                            kind, LLM_MODEL, PROMPT_VERSIONS[kind])
+
+def cached_call(kind: str, content_hash, call, tags=None):
+    """Return the cached response for a document, or run `call()` and cache its result."""
+    hit = lookup(kind, [content_hash], tags)
+    if content_hash in hit:
+        return hit[content_hash]
+    response = call()
+    store(kind, {content_hash: response}, tags)
+    return response
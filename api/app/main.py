@@ -1,8 +1,10 @@
 from fastapi import FastAPI
 from app.routes import router  # Import the routers list
 from app.db import init_db
+from app.metrics import track_requests
 
 app = FastAPI(title="Document Management API")
+app.middleware("http")(track_requests)
 
 @app.on_event("startup")
 def startup_event():
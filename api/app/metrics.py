@@ -0,0 +1,265 @@
+"""
+Prometheus metrics for the API, database, extraction, LLM calls and Celery tasks.
+
+The API serves them on /metrics. Celery workers serve them on METRICS_PORT; prefork workers
+set PROMETHEUS_MULTIPROC_DIR so the metrics of all child processes are added up.
+"""
+import functools
+import inspect
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+from contextvars import ContextVar
+from prometheus_client import (CollectorRegistry, Counter, Histogram, REGISTRY, multiprocess, start_http_server,
+                               generate_latest, CONTENT_TYPE_LATEST)
+from prometheus_client.core import GaugeMetricFamily
+from celery.signals import task_prerun, task_postrun, worker_init, worker_process_shutdown
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0: workers do not serve metrics
+# The API's profiler routes expose stack samples, so they exist only when enabled
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "0") == "1"
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp")
+
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_SLOW_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+HTTP_REQUEST_SECONDS = Histogram("http_request_duration_seconds", "API request latency by route template",
+                                 ["method", "route", "status"], buckets=_FAST_BUCKETS)
+DB_CALL_SECONDS = Histogram("db_call_duration_seconds", "Duration of app.db and app.db_async functions",
+                            ["function"], buckets=_FAST_BUCKETS)
+DB_QUERIES = Counter("db_queries_total", "SQL statements sent, by the app.db function that sent them", ["function"])
+EXTRACTION_SECONDS = Histogram("extraction_duration_seconds", "Text extraction time per .docx document",
+                               ["extractor"], buckets=_FAST_BUCKETS)
+EXTRACTION_FAILURES = Counter("extraction_failures_total", "Documents whose text could not be extracted", ["extractor"])
+LLM_REQUEST_SECONDS = Histogram("llm_request_duration_seconds", "OpenAI request latency, retries included",
+                                ["task", "outcome"], buckets=_SLOW_BUCKETS)
+LLM_TOKENS = Counter("llm_tokens_total", "OpenAI tokens used", ["task", "type"])
+LLM_RETRIES = Counter("llm_retries_total", "Retried OpenAI requests", ["task", "reason"])
+TAG_MATCHES = Counter("tag_matches_total", "Tag names from the LLM by how they matched the vocabulary", ["match"])
+TASK_SECONDS = Histogram("celery_task_duration_seconds", "Celery task run time", ["task", "state"],
+                         buckets=_SLOW_BUCKETS)
+
+# Name of the Celery task an LLM call is made for; set around the coroutine on the LLM event loop
+llm_task = ContextVar("llm_task", default="none")
+_db_function = ContextVar("db_function", default="other")
+
+# -- API --
+
+async def track_requests(request, call_next):
+    """HTTP middleware: request latency by route template, so folder paths do not become labels."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(request.method, getattr(route, "path", "unmatched"), str(status)).observe(
+            time.perf_counter() - started)
+
+def render_metrics() -> tuple:
+    """The metrics of this process (and of its siblings in multiprocess mode) in the text exposition format."""
+    registry = REGISTRY
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+class QueueDepthCollector:
+    """Length of each Celery queue and of each tenant queue, read from Redis when metrics are scraped."""
+    def collect(self):
+        from app.pipeline import QUEUES, queue_length
+        from app.scheduling import get_tenant_backlog
+        gauge = GaugeMetricFamily("celery_queue_length", "Tasks waiting in a Celery queue", labels=["queue"])
+        for queue in QUEUES:
+            try:
+                gauge.add_metric([queue], queue_length(queue))
+            except Exception:
+                continue
+        yield gauge
+
+        gauge = GaugeMetricFamily("scheduler_tenant_backlog", "Child jobs waiting in a tenant queue", labels=["tenant"])
+        try:
+            for tenant, waiting in get_tenant_backlog().items():
+                gauge.add_metric([tenant], waiting)
+        except Exception:
+            pass
+        yield gauge
+
+# -- database --
+
+def instrument_db_module(module):
+    """
+    Wrap the public functions of a database module (app.db, app.db_async) that use its
+    engine, to time them and to attribute the SQL statements they send. Call at the end of
+    the module.
+    """
+    for name, value in list(vars(module).items()):
+        if name.startswith("_") or not inspect.isfunction(value) or value.__module__ != module.__name__:
+            continue
+        if not {"engine", "async_engine"} & set(value.__code__.co_names):
+            continue  # SQL and parameter helpers
+        setattr(module, name, _timed_db_function(name, value))
+
+def _timed_db_function(name, function):
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def timed_async(*args, **kwargs):
+            token = _db_function.set(name)
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                DB_CALL_SECONDS.labels(name).observe(time.perf_counter() - started)
+                _db_function.reset(token)
+        return timed_async
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        token = _db_function.set(name)
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            DB_CALL_SECONDS.labels(name).observe(time.perf_counter() - started)
+            _db_function.reset(token)
+    return timed
+
+def count_queries(connection, cursor, statement, parameters, context, executemany):
+    """before_cursor_execute listener that counts a statement for the running app.db function."""
+    DB_QUERIES.labels(_db_function.get()).inc()
+
+# -- extraction --
+
+def observe_extraction(extractor: str, seconds: float, failed: bool = False):
+    if failed:
+        EXTRACTION_FAILURES.labels(extractor).inc()
+    else:
+        EXTRACTION_SECONDS.labels(extractor).observe(seconds)
+
+# -- LLM --
+
+def current_task_name() -> str:
+    """Short name of the Celery task running in this thread, to label LLM metrics with."""
+    from celery import current_task
+    return current_task.name.rsplit(".", 1)[-1] if current_task else "none"
+
+async def with_llm_task(name: str, coro):
+    """Run a coroutine on the LLM event loop with its metrics labelled by task `name`."""
+    llm_task.set(name)
+    return await coro
+
+def observe_llm_request(seconds: float, outcome: str, usage=None):
+    task = llm_task.get()
+    LLM_REQUEST_SECONDS.labels(task, outcome).observe(seconds)
+    if usage is not None:
+        LLM_TOKENS.labels(task, "prompt").inc(usage.prompt_tokens)
+        LLM_TOKENS.labels(task, "completion").inc(usage.completion_tokens)
+
+def observe_llm_retry(reason: str):
+    LLM_RETRIES.labels(llm_task.get(), reason).inc()
+
+# -- Celery --
+
+_task_started = {}
+
+@task_prerun.connect
+def _on_task_start(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def _on_task_end(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        TASK_SECONDS.labels(task.name.rsplit(".", 1)[-1], state or "UNKNOWN").observe(time.perf_counter() - started)
+
+@worker_init.connect
+def _start_worker_metrics(**kwargs):
+    """Serve the worker's metrics on METRICS_PORT, from the main process of the worker."""
+    directory = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):  # counters of a previous run
+            os.remove(os.path.join(directory, name))
+    if METRICS_PORT:
+        registry = REGISTRY
+        if directory:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        start_http_server(METRICS_PORT, registry=registry)
+    signal.signal(signal.SIGUSR2, _toggle_profiler)
+
+@worker_process_shutdown.connect
+def _mark_process_dead(pid=None, **kwargs):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+# -- sampling profiler --
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all threads of this process every PROFILER_INTERVAL seconds while
+    running and counts them as collapsed stacks ("frame;frame;frame count", the input format
+    of flamegraph.pl and speedscope). Costs nothing while stopped.
+    """
+    def __init__(self, interval: float = PROFILER_INTERVAL):
+        self.interval = interval
+        self.stacks = StackCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float = None):
+        """Start sampling, from scratch, for `seconds` or until stopped."""
+        if self.running:
+            return
+        self.stacks.clear()
+        self.samples = 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(seconds,), name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self, seconds):
+        deadline = time.monotonic() + seconds if seconds else None
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+profiler = SamplingProfiler()
+
+def _toggle_profiler(signum, frame):
+    """SIGUSR2 in a worker process: start the profiler, or stop it and write PROFILE_DIR/profile-<pid>.txt."""
+    if not profiler.running:
+        profiler.start()
+        return
+    profiler.stop()
+    with open(os.path.join(PROFILE_DIR, f"profile-{os.getpid()}.txt"), "w") as f:
+        f.write(profiler.collapsed())
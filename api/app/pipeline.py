@@ -0,0 +1,141 @@
+import os
+import time
+import redis
+import redis.asyncio as aioredis
+from celery.signals import task_prerun, task_postrun
+from app.cache import get_redis, get_async_redis
+
+BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+RESULT_BACKEND_URL = os.getenv("CELERY_RESULT_BACKEND", "redis://redis:6379/1")
+
+# CPU-bound work (scanning, DOCX parsing, fingerprinting, embedding) runs on the extract
+# queue in a prefork worker with a process per core; OpenAI calls run on the llm queue in
+# a worker with a thread pool. Folder fan-out and maintenance tasks stay on the default queue.
+EXTRACT_QUEUE = "extract"
+LLM_QUEUE = "llm"
+DEFAULT_QUEUE = "celery"
+# Interactive requests skip the tenant queues of app.scheduling and go to these queues,
+# which workers poll before their other queues
+INTERACTIVE_QUEUES = {EXTRACT_QUEUE: "extract-interactive", LLM_QUEUE: "llm-interactive"}
+QUEUES = (*INTERACTIVE_QUEUES.values(), DEFAULT_QUEUE, EXTRACT_QUEUE, LLM_QUEUE)
+
+# Extraction holds back while this many LLM tasks are waiting, so parsed documents do not
+# pile up faster than OpenAI can take them
+LLM_QUEUE_MAX_LENGTH = int(os.getenv("LLM_QUEUE_MAX_LENGTH", "200"))
+BACKPRESSURE_RETRY_SECONDS = float(os.getenv("BACKPRESSURE_RETRY_SECONDS", "5"))
+# An extraction that is held back this many times fails its job instead of waiting forever
+BACKPRESSURE_MAX_RETRIES = int(os.getenv("BACKPRESSURE_MAX_RETRIES", "120"))
+
+# Pipeline stage of each task whose throughput is recorded; batch tasks take their list of
+# (document_id, path) pairs as second argument, the others handle one document
+TASK_STAGES = {
+    "app.tasks.extract_documents_task": "extract",
+    "app.tasks.fingerprint_documents_task": "fingerprint",
+    "app.tasks.embed_documents_task": "embed",
+    "app.tasks.tag_documents_task": "llm",
+    "app.tasks.summarize_document": "llm",
+    "app.tasks.analyze_document_task": "llm",
+    "app.tasks.analyze_documents_batch_task": "llm",
+}
+STAGES = ("extract", "fingerprint", "embed", "llm")
+STATS_PREFIX = "pipeline:stage"
+THROUGHPUT_WINDOW_MINUTES = 5
+
+_broker = None
+_async_broker = None
+
+def get_broker_redis():
+    """Redis client on the Celery broker database, to read queue lengths."""
+    global _broker
+    if _broker is None:
+        _broker = redis.Redis.from_url(BROKER_URL, socket_timeout=1, socket_connect_timeout=1)
+    return _broker
+
+def get_async_broker_redis():
+    """asyncio Redis client on the Celery broker database, for the API routes."""
+    global _async_broker
+    if _async_broker is None:
+        _async_broker = aioredis.Redis.from_url(BROKER_URL, socket_timeout=1, socket_connect_timeout=1)
+    return _async_broker
+
+def queue_length(queue: str) -> int:
+    """Number of tasks waiting in a Celery queue (a Redis list named after the queue)."""
+    return get_broker_redis().llen(queue)
+
+def llm_queue_full() -> bool:
+    """
+    Whether the LLM stage is saturated: the tasks waiting in all LLM queues, interactive
+    included. A broker that cannot be read does not hold extraction back.
+    """
+    try:
+        waiting = sum(queue_length(queue) for queue in (LLM_QUEUE, INTERACTIVE_QUEUES[LLM_QUEUE]))
+        return waiting >= LLM_QUEUE_MAX_LENGTH
+    except redis.RedisError as e:
+        print(f"Could not read the LLM queue length: {e}")
+        return False
+
+def _minute_key(stage: str, minute: int) -> str:
+    return f"{STATS_PREFIX}:{stage}:minute:{minute}"
+
+def record_stage(name: str, documents: int, seconds: float, failed: bool = False):
+    """
+    Count a finished task of a pipeline stage in Redis: its documents, busy time and
+    failures, plus the documents finished per minute for recent throughput. Errors talking
+    to Redis are logged, not raised.
+    """
+    try:
+        minute = int(time.time() // 60)
+        pipeline = get_redis().pipeline(transaction=False)
+        pipeline.hincrby(f"{STATS_PREFIX}:{name}", "tasks", 1)
+        pipeline.hincrby(f"{STATS_PREFIX}:{name}", "failures" if failed else "documents", 1 if failed else documents)
+        pipeline.hincrbyfloat(f"{STATS_PREFIX}:{name}", "busy_seconds", seconds)
+        if not failed:
+            pipeline.incrby(_minute_key(name, minute), documents)
+            pipeline.expire(_minute_key(name, minute), 3600)
+        pipeline.execute()
+    except redis.RedisError as e:
+        print(f"Could not record {name} stage stats: {e}")
+
+_started = {}  # task id -> perf_counter at start; workers run tasks in processes or threads
+
+@task_prerun.connect
+def _task_started(task_id=None, task=None, **kwargs):
+    if task is not None and task.name in TASK_STAGES:
+        _started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, args=(), state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if started is None or state == "RETRY":  # held back by backpressure, counted when it runs
+        return
+    documents = len(args[1]) if len(args) > 1 and isinstance(args[1], list) else 1
+    record_stage(TASK_STAGES[task.name], documents, time.perf_counter() - started, failed=state != "SUCCESS")
+
+async def get_pipeline_stats() -> dict:
+    """
+    Per stage: task, document and failure counts, documents per busy second (per worker
+    slot) and documents per minute over the last few minutes, with the waiting queue lengths.
+    """
+    client = get_async_redis()
+    minute = int(time.time() // 60)
+    stages = {}
+    for name in STAGES:
+        counters = {k.decode(): float(v) for k, v in (await client.hgetall(f"{STATS_PREFIX}:{name}")).items()}
+        recent = await client.mget([_minute_key(name, minute - i) for i in range(1, THROUGHPUT_WINDOW_MINUTES + 1)])
+        busy = counters.get("busy_seconds", 0.0)
+        stages[name] = {
+            "tasks": int(counters.get("tasks", 0)),
+            "documents": int(counters.get("documents", 0)),
+            "failures": int(counters.get("failures", 0)),
+            "busy_seconds": round(busy, 1),
+            "documents_per_busy_second": round(counters.get("documents", 0) / busy, 2) if busy else None,
+            "documents_per_minute": round(sum(int(v or 0) for v in recent) / THROUGHPUT_WINDOW_MINUTES, 1),
+        }
+
+    queues = {}
+    for queue in QUEUES:
+        try:
+            queues[queue] = await get_async_broker_redis().llen(queue)
+        except redis.RedisError:
+            queues[queue] = None
+    return {"stages": stages, "queues": queues, "llm_queue_max_length": LLM_QUEUE_MAX_LENGTH}
@@ -1,8 +1,24 @@
 import os
+import time
+import zipfile
 from datetime import datetime
 from docx import Document
-import re
+from docx.styles import BabelFish
+from lxml import etree
 from pathlib import Path
+from app.metrics import observe_extraction
+from app.scanner import scan_docx_files
+
+DOCX_EXTRACTOR = os.getenv("DOCX_EXTRACTOR", "stream")
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_BODY, W_P, W_TBL, W_TR, W_TC = f"{W_NS}body", f"{W_NS}p", f"{W_NS}tbl", f"{W_NS}tr", f"{W_NS}tc"
+W_R, W_HYPERLINK, W_T, W_BR = f"{W_NS}r", f"{W_NS}hyperlink", f"{W_NS}t", f"{W_NS}br"
+W_PPR, W_PSTYLE, W_TRPR, W_TCPR = f"{W_NS}pPr", f"{W_NS}pStyle", f"{W_NS}trPr", f"{W_NS}tcPr"
+W_GRID_BEFORE, W_GRID_SPAN, W_VMERGE = f"{W_NS}gridBefore", f"{W_NS}gridSpan", f"{W_NS}vMerge"
+W_STYLE, W_NAME, W_VAL, W_TYPE = f"{W_NS}style", f"{W_NS}name", f"{W_NS}val", f"{W_NS}type"
+W_STYLE_ID, W_DEFAULT = f"{W_NS}styleId", f"{W_NS}default"
+RUN_TEXT = {f"{W_NS}tab": "\t", f"{W_NS}ptab": "\t", f"{W_NS}cr": "\n", f"{W_NS}noBreakHyphen": "-"}
 
 def get_file_metadata(file_path: str) -> dict:
     """Get basic metadata of a file: size in KB and last modified time."""
@@ -18,60 +34,194 @@ def get_file_metadata(file_path: str) -> dict:
         return None, None
     
 def process_folder(path: str) -> list:
-    """Process all .docx files in the folder and return their metadata."""
+    """Process all .docx files in the folder tree and return their metadata."""
     try:
-        return [
-            get_file_metadata(os.path.join(path, name))
-            for name in os.listdir(path)
-            if os.path.isfile(os.path.join(path, name)) and name.endswith('.docx')
-        ]
+        return [get_file_metadata(file.path) for file in scan_docx_files(path)]
     except Exception as e:
         print(f"Error processing folder {path}: {e}")
         return []
     
 def clean_paragraph_text(text: str) -> str:
-    """Basic cleaning: normalize whitespace, strip, remove weird chars."""
-    text = text.replace("\xa0", " ")        # non-breaking spaces
-    text = re.sub(r"\s+", " ", text)        # collapse multiple spaces/newlines
-    return text.strip()
+    """Basic cleaning: normalize whitespace (including non-breaking spaces) and strip."""
+    return " ".join(text.split())
+
+def format_paragraph(text: str, style: str) -> str:
+    """Render a cleaned paragraph as markdown-like text based on its style name."""
+    if style.startswith("Heading"):
+        return f"\n## {text}\n"  # markdown-like heading H2
+    elif "List" in style or text.startswith(("-", "•", "*", "1.", "a.")):
+        return f"- {text}"
+    return text
+
+def format_table(rows: list) -> str:
+    """Render table rows (lists of cleaned cell texts) as a markdown-like table."""
+    header = " | ".join(rows[0])
+    sep = " | ".join(["---"] * len(rows[0]))
+    body = [" | ".join(r) for r in rows[1:]]
+    return "\n" + "\n".join([header, sep] + body) + "\n"
     
+def extract_body_from_docx(file_path: str) -> str:
+    """Extract and clean the body text of a .docx file through the python-docx object model."""
+    doc = Document(file_path)
+    parts = []
+
+    # Extract paragraphs in order
+    for para in doc.paragraphs:
+        text = clean_paragraph_text(para.text)
+        if text:
+            style = para.style.name if para.style else ""
+            parts.append(format_paragraph(text, style or ""))
+
+    # Extract tables in order
+    for table in doc.tables:
+        rows = []
+        for row in table.rows:
+            cells = [clean_paragraph_text(cell.text) for cell in row.cells]
+            rows.append(cells)
+        if rows:
+            parts.append(format_table(rows))
+
+    # Join everything into one string
+    return "\n".join(parts)
+
+def _load_paragraph_styles(archive: zipfile.ZipFile) -> tuple:
+    """Map paragraph style IDs to their UI names and find the default paragraph style."""
+    try:
+        root = etree.fromstring(archive.read("word/styles.xml"), etree.XMLParser(resolve_entities=False))
+    except KeyError:
+        return {}, ""
+
+    names, default = {}, ""
+    for style in root.iterchildren(W_STYLE):
+        if style.get(W_TYPE) != "paragraph":
+            continue
+        name = style.find(W_NAME)
+        name = BabelFish.internal2ui(name.get(W_VAL)) if name is not None else ""
+        names[style.get(W_STYLE_ID)] = name
+        if style.get(W_DEFAULT) in ("1", "true", "on"):
+            default = name
+    return names, default
+
+def _run_text(run) -> str:
+    """Text of a w:r element, with the same translation of tabs and breaks as python-docx."""
+    parts = []
+    for child in run:
+        if child.tag == W_T:
+            parts.append(child.text or "")
+        elif child.tag == W_BR:
+            if child.get(W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        elif child.tag in RUN_TEXT:
+            parts.append(RUN_TEXT[child.tag])
+    return "".join(parts)
+
+def _paragraph_text(p) -> str:
+    """Text of a w:p element from its runs and hyperlinks."""
+    parts = []
+    for child in p:
+        if child.tag == W_R:
+            parts.append(_run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(_run_text(r) for r in child.iterchildren(W_R))
+    return "".join(parts)
+
+def _paragraph_style(p, styles: dict, default_style: str) -> str:
+    """UI name of the style applied to a w:p element."""
+    ppr = p.find(W_PPR)
+    pstyle = ppr.find(W_PSTYLE) if ppr is not None else None
+    if pstyle is None:
+        return default_style
+    return styles.get(pstyle.get(W_VAL), default_style)
+
+def _table_rows(tbl) -> list:
+    """
+    Cleaned cell texts of a w:tbl element per row. Like python-docx, a horizontally spanned
+    cell repeats for every grid column and a vertically merged cell repeats the cell above.
+    """
+    rows = []
+    above = {}
+    for tr in tbl.iterchildren(W_TR):
+        trpr = tr.find(W_TRPR)
+        grid_before = trpr.find(W_GRID_BEFORE) if trpr is not None else None
+        offset = int(grid_before.get(W_VAL, 0)) if grid_before is not None else 0
+
+        cells, current = [], {}
+        for tc in tr.iterchildren(W_TC):
+            tcpr = tc.find(W_TCPR)
+            span = tcpr.find(W_GRID_SPAN) if tcpr is not None else None
+            span = int(span.get(W_VAL, 1)) if span is not None else 1
+            vmerge = tcpr.find(W_VMERGE) if tcpr is not None else None
+
+            if vmerge is not None and vmerge.get(W_VAL, "continue") == "continue":
+                text = above.get(offset, "")
+            else:
+                text = clean_paragraph_text("\n".join(_paragraph_text(p) for p in tc.iterchildren(W_P)))
+
+            current[offset] = text
+            cells.extend([text] * span)
+            offset += span
+
+        rows.append(cells)
+        above = current
+    return rows
+
+def extract_body_from_docx_stream(file_path: str) -> str:
+    """
+    Extract and clean the body text of a .docx file by stream-parsing word/document.xml
+    with iterparse. Paragraphs and tables are emitted in document order and every
+    top-level element is freed once rendered, so memory stays flat on large documents.
+    """
+    parts = []
+    with zipfile.ZipFile(file_path) as archive:
+        styles, default_style = _load_paragraph_styles(archive)
+
+        with archive.open("word/document.xml") as xml:
+            for _, elem in etree.iterparse(xml, events=("end",), tag=(W_P, W_TBL), resolve_entities=False):
+                parent = elem.getparent()
+                if parent is None or parent.tag != W_BODY:
+                    continue  # paragraphs inside tables are rendered with their table
+
+                if elem.tag == W_P:
+                    text = clean_paragraph_text(_paragraph_text(elem))
+                    if text:
+                        parts.append(format_paragraph(text, _paragraph_style(elem, styles, default_style)))
+                else:
+                    rows = _table_rows(elem)
+                    if rows:
+                        parts.append(format_table(rows))
+
+                elem.clear(keep_tail=True)
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+    return "\n".join(parts)
+
+EXTRACTORS = {
+    "python-docx": extract_body_from_docx,
+    "stream": extract_body_from_docx_stream,
+}
+
+def extract_body(file_path: str, extractor: str = DOCX_EXTRACTOR) -> str:
+    """Extract the body text of a .docx file with the configured extraction engine."""
+    started = time.perf_counter()
+    try:
+        body = EXTRACTORS[extractor](file_path)
+    except Exception:
+        observe_extraction(extractor, 0, failed=True)
+        raise
+    observe_extraction(extractor, time.perf_counter() - started)
+    return body
+
+def format_document_text(file_path: str, body: str) -> str:
+    """Prefix the extracted body text with the file name as title."""
+    filename = Path(file_path).stem
+    return f"# {filename}\n\n{body}".strip()  # Title as H1
+
 def extract_text_from_docx(file_path: str) -> str:
     """Extract and clean text from a .docx file, preserving some structure."""
     try:
-        doc = Document(file_path)
-        parts = []
-
-        filename = Path(file_path).stem
-        parts.append(f"# {filename}\n")  # Title as H1
-
-        # Extract paragraphs in order
-        for para in doc.paragraphs:
-            text = clean_paragraph_text(para.text)
-            if text:
-                style = para.style.name if para.style else ""
-                if style.startswith("Heading"):
-                    parts.append(f"\n## {text}\n")  # markdown-like heading H2
-                elif "List" in style or text.startswith(("-", "•", "*", "1.", "a.")):
-                    parts.append(f"- {text}")
-                else:
-                    parts.append(text)
-
-        # Extract tables in order
-        for table in doc.tables:
-            rows = []
-            for row in table.rows:
-                cells = [clean_paragraph_text(cell.text) for cell in row.cells]
-                rows.append(cells)
-            if rows:
-                header = " | ".join(rows[0])
-                sep = " | ".join(["---"] * len(rows[0]))
-                body = [" | ".join(r) for r in rows[1:]]
-                table_str = "\n".join([header, sep] + body)
-                parts.append("\n" + table_str + "\n")
-
-        # Join everything into one string
-        return "\n".join(parts).strip()
+        return format_document_text(file_path, extract_body(file_path))
 
     except Exception as e:
         print(f"Error extracting text from {file_path}: {e}")
-        return ""
\ No newline at end of file
+        return ""
@@ -1,7 +1,16 @@
 from fastapi import APIRouter
 from .folder_insights import router as folder_insights_router
 from .document_classification import router as document_classification_router
+from .jobs import router as jobs_router
+from .search import router as search_router
+from .metrics import router as metrics_router, profiler_router
+from app.metrics import PROFILER_ENABLED
 
 router = APIRouter()
 router.include_router(folder_insights_router, prefix="/folder-insights", tags=["Folder Insights"])
-router.include_router(document_classification_router, prefix="/document-classification", tags=["Document Classification"])
\ No newline at end of file
+router.include_router(document_classification_router, prefix="/document-classification", tags=["Document Classification"])
+router.include_router(jobs_router, prefix="/jobs", tags=["Jobs"])
+router.include_router(search_router, prefix="/search", tags=["Search"])
+router.include_router(metrics_router, tags=["Metrics"])
+if PROFILER_ENABLED:
+    router.include_router(profiler_router, tags=["Metrics"])
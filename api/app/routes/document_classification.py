@@ -1,92 +1,118 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 import os
-from app.db import get_documents_in_folder, create_job, check_document_tagged, check_document_summarized, get_document_id_by_path
-from app.tasks import tag_documents_task, summarize_document
+from app.db_async import create_job, get_preclassifier_metrics, get_llm_cache_stats
+from app.scanner import CLIENT_DATA_ROOT
+from app.tasks import tag_folder_task, summarize_folder_task, analyze_folder_task, embed_folder_task
 
 router = APIRouter()
-BASE_PATH = os.path.join(os.path.dirname(__file__), "Client Data")
+BASE_PATH = CLIENT_DATA_ROOT
+# A user waiting on a small folder; bulk runs leave it off so they share the workers fairly
+INTERACTIVE = Query(False, description="Run on the high-priority lane; only for requests of at most "
+                                       "SCHEDULER_INTERACTIVE_MAX_CHILDREN child jobs, larger ones are scheduled normally")
+
+def resolve_folder(folder_path: str) -> str:
+    """Resolve a client folder path below BASE_PATH or raise the matching HTTP error."""
+    full_path = os.path.normpath(os.path.join(BASE_PATH, folder_path))
+    if os.path.commonpath([BASE_PATH, full_path]) != BASE_PATH:
+        raise HTTPException(status_code=400, detail="Invalid folder path")
+    elif not os.path.exists(full_path) or not os.path.isdir(full_path):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    return full_path
+
+@router.get("/preclassifier_metrics")
+async def preclassifier_metrics(days: int = 30):
+    """How often the local pre-classifier avoided an LLM call, and how often it agrees with the LLM."""
+    try:
+        m = await get_preclassifier_metrics(days)
+
+        def rate(part, whole):
+            return round(part / whole, 3) if whole else None
+
+        return {
+            "days": days,
+            "documents": m["documents"],
+            "llm_avoidance_rate": rate(m["llm_avoided"], m["documents"]),
+            "confident_agreement": {"sampled": m["shadowed"], "rate": rate(m["shadow_agreed"], m["shadowed"])},
+            "ambiguous_agreement": {"sampled": m["ambiguous"], "rate": rate(m["ambiguous_agreed"], m["ambiguous"])},
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/llm_cache_stats")
+async def llm_cache_stats():
+    """Hit rates of the cached LLM responses per kind of call (tag, summary, analyze)."""
+    try:
+        return {
+            row["kind"]: {"hits": row["hits"], "misses": row["misses"], "entries": row["entries"],
+                          "hit_rate": round(row["hits"] / (row["hits"] + row["misses"]), 3)
+                                      if row["hits"] + row["misses"] else None}
+            for row in await get_llm_cache_stats()
+        }
+
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{folder_path:path}/tag_documents")
-async def tag_documents(folder_path: str):
-    """Tag all .docx documents in the specified folder."""
+async def tag_documents(folder_path: str, interactive: bool = INTERACTIVE):
+    """Tag all untagged .docx documents in the specified folder tree."""
     try:
-        full_path = os.path.normpath(os.path.join(BASE_PATH, folder_path))
-        if not full_path.startswith(BASE_PATH):
-            raise HTTPException(status_code=400, detail="Invalid folder path")
-        elif not os.path.exists(full_path) or not os.path.isdir(full_path):
-            raise HTTPException(status_code=404, detail="Folder not found")
-        
-        files = [
-            f for f in os.listdir(full_path)
-            if f.endswith(".docx") and os.path.isfile(os.path.join(full_path, f))
-        ]
-
-        if not files:
-            return {"folder_path": folder_path, "status": "No documents found in folder"}
-
-        jobs_ids = []
-        for file in files:
-            file_path = os.path.join(full_path, file)
-
-            print(f"Checking tagging for {file_path}")  # Debugging line
-
-            if not check_document_tagged(file_path):
-                print(f"Tagging document: {file_path}")  # Debugging line
-
-                job_id = create_job(status="PENDING")
-                print(f"Created job {job_id} for {file_path}")  # Debugging line
-                document_id = get_document_id_by_path(file_path)
-                print(f"Document ID for {file_path} is {document_id}")
-
-                result = tag_documents_task.delay(job_id, document_id, file_path)
-                print(f"Dispatched tagging task for job {job_id}, result: {result}")  # Debugging line
-                jobs_ids.append(job_id)
-
-        if jobs_ids:
-            return {"folder_path": folder_path,
-                    "job_ids": jobs_ids,
-                    "status": f"Tagging jobs started for {len(jobs_ids)} untagged documents"}
-        else:
-            return {"folder_path": folder_path,
-                    "status": "All documents already tagged"}
+        full_path = resolve_folder(folder_path)
+
+        job_id = await create_job(kind="tag")
+        tag_folder_task.delay(job_id, full_path, interactive)
 
+        return {"folder_path": folder_path, "job_id": job_id, "status": "Tagging job started"}
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    
+
 @router.get("/{folder_path:path}/summarize_documents")
-async def summarize_documents(folder_path: str):
-    """Summarize all .docx documents in the specified folder."""
+async def summarize_documents(folder_path: str, interactive: bool = INTERACTIVE):
+    """Summarize all unsummarized .docx documents in the specified folder tree."""
     try:
-        full_path = os.path.normpath(os.path.join(BASE_PATH, folder_path))
-        if not full_path.startswith(BASE_PATH):
-            raise HTTPException(status_code=400, detail="Invalid folder path")
-        elif not os.path.exists(full_path) or not os.path.isdir(full_path):
-            raise HTTPException(status_code=404, detail="Folder not found")
-        
-        files = [
-            f for f in os.listdir(full_path)
-            if f.endswith(".docx") and os.path.isfile(os.path.join(full_path, f))
-        ]
-
-        if not files:
-            return {"folder_path": folder_path, "status": "No documents found in folder"}
-
-        jobs_ids = []
-        for file in files:
-            file_path = os.path.join(full_path, file)
-
-            if not check_document_summarized(file_path):
-                job_id = create_job(status="PENDING")
-                summarize_document.delay(job_id, file_path)
-                jobs_ids.append(job_id)
-        
-        if jobs_ids:
-            return {"folder_path": folder_path,
-                    "job_ids": jobs_ids,
-                    "status": f"Summarization jobs started for {len(files)} unsummarized documents"}
-        else:
-            return {"folder_path": folder_path,
-                    "status": "All documents already summarized"}
+        full_path = resolve_folder(folder_path)
+
+        job_id = await create_job(kind="summarize")
+        summarize_folder_task.delay(job_id, full_path, interactive)
+
+        return {"folder_path": folder_path, "job_id": job_id, "status": "Summarization job started"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{folder_path:path}/analyze_documents")
+async def analyze_documents(folder_path: str, interactive: bool = INTERACTIVE):
+    """Tag and summarize all .docx documents in the specified folder tree, batching documents per LLM request."""
+    try:
+        full_path = resolve_folder(folder_path)
+
+        job_id = await create_job(kind="analyze")
+        analyze_folder_task.delay(job_id, full_path, interactive)
+
+        return {"folder_path": folder_path, "job_id": job_id, "status": "Analysis job started"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{folder_path:path}/embed_documents")
+async def embed_documents(folder_path: str, interactive: bool = INTERACTIVE):
+    """Embed the new and changed .docx documents in the specified folder tree for semantic search."""
+    try:
+        full_path = resolve_folder(folder_path)
+
+        job_id = await create_job(kind="embed")
+        embed_folder_task.delay(job_id, full_path, interactive)
+
+        return {"folder_path": folder_path, "job_id": job_id, "status": "Embedding job started"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,51 +1,119 @@
 from fastapi import APIRouter, HTTPException
-from app.db import get_folder_count, create_job, get_documents_metadata_in_folder
+from datetime import datetime
+import base64
+from app.db_async import get_folder_count, create_job, get_documents_metadata_in_folder, get_duplicate_clusters_in_folder
 from app.tasks import update_folder_count, update_folder_files_metadata
+from app.cache import cached, get_cache_stats
+from app.pipeline import EXTRACT_QUEUE, INTERACTIVE_QUEUES
+from app.scanner import CLIENT_DATA_ROOT
+from app.routes.document_classification import resolve_folder
 import os
 
 router = APIRouter()
-BASE_PATH = os.path.join(os.path.dirname(__file__), "Client Data")
+BASE_PATH = CLIENT_DATA_ROOT
+
+def encode_cursor(row) -> str:
+    """
+    Opaque keyset cursor pointing after `row` in a (modified DESC, id DESC) listing, where
+    documents without a modified time come last.
+    """
+    modified = row["modified"].isoformat() if row["modified"] is not None else ""
+    return base64.urlsafe_b64encode(f"{modified}|{row['id']}".encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor from encode_cursor into the (modified or None, id) it points after."""
+    try:
+        modified, _, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+        return datetime.fromisoformat(modified) if modified else None, int(document_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/cache_stats")
+async def cache_stats():
+    """Hit/miss counters of the folder insights cache."""
+    try:
+        return await get_cache_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{folder_path:path}/count_files")
 async def folder_count(folder_path: str):
     """Count .docx files in the specified folder and return the cached count or start a job."""
     try:
-        full_path = os.path.normpath(os.path.join(BASE_PATH, folder_path))
-        if not full_path.startswith(BASE_PATH):
-            raise HTTPException(status_code=400, detail="Invalid folder path")
-        elif not os.path.exists(full_path):
-            raise HTTPException(status_code=404, detail="Folder not found")
+        full_path = resolve_folder(folder_path)
 
-        count = get_folder_count(full_path)
+        count = await cached("count", full_path, {}, lambda: get_folder_count(full_path))
         if count is not None:
             return {"folder_path": folder_path, "document_count": count}
         
-        job_id = create_job(status="PENDING")
-        update_folder_count.delay(job_id, full_path)
+        job_id = await create_job(kind="count")
+        update_folder_count.apply_async((job_id, full_path), queue=INTERACTIVE_QUEUES[EXTRACT_QUEUE])
 
         return {"folder_path": folder_path, "job_id": job_id, "status": "Job started to count documents"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
         
 @router.get("/{folder_path:path}/get_folder_files_metadata")
-async def get_file_metadata(folder_path: str, limit: int = 10):
-    """Retrieve cached metadata for files in the folder or start a job to insert metadata."""
+async def get_file_metadata(folder_path: str, limit: int = 10, cursor: str | None = None):
+    """
+    Retrieve cached metadata for files in the folder tree, newest first, or start a job to insert metadata.
+    A full page includes a `next_cursor` to pass as `cursor` for the following page.
+    """
     try:
-        full_path = os.path.normpath(os.path.join(BASE_PATH, folder_path))
-        if not full_path.startswith(BASE_PATH):
-            raise HTTPException(status_code=400, detail="Invalid folder path")
-        elif not os.path.exists(full_path) or not os.path.isdir(full_path):
-            raise HTTPException(status_code=404, detail="Folder not found")
-
-        files = get_documents_metadata_in_folder(full_path, limit)
-        if files:
-            return {"folder_path": folder_path, "files": files}
-
-        job_id = create_job(status="PENDING")
-        update_folder_files_metadata.delay(job_id, full_path)
+        full_path = resolve_folder(folder_path)
+
+        after = decode_cursor(cursor) if cursor else None
+
+        async def load_page():
+            files = await get_documents_metadata_in_folder(full_path, limit, after)
+            if not files and not after:
+                return None
+            next_cursor = encode_cursor(files[-1]) if len(files) == limit else None
+            return {"files": [dict(file) for file in files], "next_cursor": next_cursor}
+
+        page = await cached("metadata", full_path, {"limit": limit, "cursor": cursor}, load_page)
+        if page is not None:
+            return {"folder_path": folder_path, **page}
+
+        job_id = await create_job(kind="ingest")
+        update_folder_files_metadata.apply_async((job_id, full_path), queue=INTERACTIVE_QUEUES[EXTRACT_QUEUE])
         
         return {"folder_path": folder_path, "job_id": job_id, "status": "Jobs started to insert document metadata"}
     
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{folder_path:path}/duplicates")
+async def get_duplicates(folder_path: str, limit: int = 50, after: int = 0):
+    """
+    List the clusters of exact and near-duplicate documents with a member in the folder tree.
+    Members can live in other folders. A full page includes `next_after` for the following page.
+    """
+    try:
+        full_path = resolve_folder(folder_path)
+
+        clusters = {}
+        for row in await get_duplicate_clusters_in_folder(full_path, limit, after):
+            clusters.setdefault(row["cluster_id"], []).append({
+                "id": row["id"],
+                "path": os.path.relpath(row["path"], BASE_PATH),
+                "filename": row["filename"],
+                "modified": row["modified"],
+                "exact": row["id"] == row["cluster_id"] or bool(row["exact"]),
+            })
+
+        return {
+            "folder_path": folder_path,
+            "clusters": [{"cluster_id": cluster_id, "documents": documents} for cluster_id, documents in clusters.items()],
+            "next_after": max(clusters) if len(clusters) == limit else None,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,98 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+from app.db_async import get_jobs
+from app.events import hub, TERMINAL_STATUSES
+from app.pipeline import get_pipeline_stats
+from app.scheduling import get_scheduler_stats
+
+router = APIRouter()
+MAX_JOBS_PER_REQUEST = 1000
+HEARTBEAT_SECONDS = 15
+
+def check_job_ids(ids: list) -> list:
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No job IDs given")
+    elif len(ids) > MAX_JOBS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_JOBS_PER_REQUEST} job IDs per request")
+    return ids
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.get("")
+async def job_statuses(ids: list[int] = Query(...)):
+    """Look up the status of several jobs in one call: `/jobs?ids=1&ids=2`."""
+    try:
+        ids = check_job_ids(ids)
+        jobs = await get_jobs(ids)
+        found = {job["id"] for job in jobs}
+        return {"jobs": jobs, "missing": [job_id for job_id in ids if job_id not in found]}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/stream")
+async def job_stream(ids: list[int] = Query(...)):
+    """
+    Server-sent events for the given jobs. Starts with one `job` event per job read from
+    the database, then pushes `job` events for their changes and `child` events for the
+    progress of their child jobs as tasks publish them. The stream ends once every job is
+    done or failed.
+    """
+    ids = check_job_ids(ids)
+    queue = hub.subscribe(ids)  # subscribe before the snapshot so no update falls in between
+
+    async def events():
+        try:
+            jobs = await get_jobs(ids)
+            pending = {job["id"] for job in jobs if job["status"] not in TERMINAL_STATUSES}
+            for job in jobs:
+                yield sse("job", dict(job))
+
+            while pending:
+                try:
+                    update = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if update["id"] in ids:
+                    yield sse("job", update)
+                    if update["status"] in TERMINAL_STATUSES:
+                        pending.discard(update["id"])
+                else:
+                    yield sse("child", update)
+        finally:
+            hub.unsubscribe(ids, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/pipeline_stats")
+async def pipeline_stats():
+    """
+    Throughput of each processing stage (extract, fingerprint, embed, llm), the length of each
+    worker queue and the child jobs waiting per tenant.
+    """
+    try:
+        return {**await get_pipeline_stats(), "scheduler": await get_scheduler_stats()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{job_id}")
+async def job_status(job_id: int):
+    """Get the status of a job and the progress of its child jobs."""
+    try:
+        jobs = await get_jobs([job_id])
+        if not jobs:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return jobs[0]
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+from prometheus_client import REGISTRY
+from app.metrics import QueueDepthCollector, render_metrics, profiler
+
+router = APIRouter()
+# Included only with PROFILER_ENABLED=1 (see app.routes)
+profiler_router = APIRouter()
+MAX_PROFILE_SECONDS = 600
+
+REGISTRY.register(QueueDepthCollector())
+
+@router.get("/metrics")
+def metrics():
+    """Prometheus metrics of the API: request latency, database calls and queue depth."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@profiler_router.post("/metrics/profiler")
+def start_profiler(seconds: float = Query(30, gt=0, le=MAX_PROFILE_SECONDS)):
+    """Start sampling the stacks of the API process for `seconds`; read the result from GET /metrics/profiler."""
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="The profiler is already running")
+    profiler.start(seconds)
+    return {"status": "running", "seconds": seconds, "interval": profiler.interval}
+
+@profiler_router.delete("/metrics/profiler")
+def stop_profiler():
+    """Stop the profiler before its time is up."""
+    profiler.stop()
+    return {"status": "stopped", "samples": profiler.samples}
+
+@profiler_router.get("/metrics/profiler", response_class=PlainTextResponse)
+def profile():
+    """Sampled stacks in collapsed format (`frame;frame;frame count`), for flamegraph.pl or speedscope."""
+    return profiler.collapsed()
@@ -0,0 +1,107 @@
+from fastapi import APIRouter, HTTPException, Query
+import asyncio
+import base64
+import os
+from app.db_async import get_chunks_by_vector_rows, search_documents_full_text
+from app.embeddings import embed_texts
+from app.scanner import CLIENT_DATA_ROOT
+from app.vector_index import get_vector_index
+
+router = APIRouter()
+BASE_PATH = CLIENT_DATA_ROOT
+# Candidates fetched per requested result, to make up for chunks of the same document,
+# rows that are no longer live and rows outside the requested folder
+OVERFETCH = 5
+
+def resolve_folder(folder_path: str | None) -> str | None:
+    """Absolute path of an optional folder below the client data root."""
+    if not folder_path:
+        return None
+    folder = os.path.normpath(os.path.join(BASE_PATH, folder_path))
+    if os.path.commonpath([BASE_PATH, folder]) != BASE_PATH:
+        raise HTTPException(status_code=400, detail="Invalid folder path")
+    return folder
+
+def encode_rank_cursor(row) -> str:
+    """Opaque keyset cursor pointing after `row` in a (rank DESC, id DESC) result list."""
+    return base64.urlsafe_b64encode(f"{row['rank']!r}|{row['id']}".encode()).decode()
+
+def decode_rank_cursor(cursor: str) -> tuple:
+    """Decode a cursor from encode_rank_cursor into the (rank, id) it points after."""
+    try:
+        rank, _, document_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition("|")
+        return float(rank), int(document_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/semantic")
+async def semantic_search(query: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100),
+                          folder_path: str | None = None):
+    """
+    Find the documents whose content is closest in meaning to `query`, best first, with the
+    best matching chunk of each. Optionally limited to a folder tree.
+    """
+    try:
+        folder = resolve_folder(folder_path)
+
+        def search():
+            vector = embed_texts([query])[0]
+            return get_vector_index().search(vector, limit * OVERFETCH * (4 if folder else 1))
+
+        # Embedding and scanning the index are CPU bound; numpy releases the GIL
+        hits = await asyncio.to_thread(search)
+        scores = dict(hits)
+        chunks = await get_chunks_by_vector_rows(scores, folder)
+
+        results = {}
+        for chunk in sorted(chunks, key=lambda c: scores[c["vector_row"]], reverse=True):
+            if chunk["document_id"] in results:
+                continue
+            results[chunk["document_id"]] = {
+                "document_id": chunk["document_id"],
+                "path": os.path.relpath(chunk["path"], BASE_PATH),
+                "filename": chunk["filename"],
+                "score": round(scores[chunk["vector_row"]], 4),
+                "chunk_index": chunk["chunk_index"],
+                "snippet": chunk["snippet"],
+            }
+            if len(results) == limit:
+                break
+
+        return {"query": query, "results": list(results.values())}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/full_text")
+async def full_text_search(query: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100),
+                           folder_path: str | None = None, tag: str | None = None, cursor: str | None = None):
+    """
+    Find the documents whose name, summary or content contain the words of `query` (Dutch
+    and English stemming; "quoted phrases", `or` and `-word` are supported), best match
+    first, with a snippet of the matching text. Optionally limited to a folder tree and to
+    documents with a tag. A full page includes a `next_cursor` to pass as `cursor` for the
+    following page.
+    """
+    try:
+        folder = resolve_folder(folder_path)
+        after = decode_rank_cursor(cursor) if cursor else None
+        rows = await search_documents_full_text(query, limit, after, folder, tag)
+
+        results = [{
+            "document_id": row["id"],
+            "path": os.path.relpath(row["path"], BASE_PATH),
+            "filename": row["filename"],
+            "modified": row["modified"],
+            "score": round(row["rank"], 4),
+            "snippet": row["snippet"],
+        } for row in rows]
+        next_cursor = encode_rank_cursor(rows[-1]) if len(rows) == limit else None
+        return {"query": query, "results": results, "next_cursor": next_cursor}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
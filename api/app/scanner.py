@@ -0,0 +1,84 @@
+import os
+from typing import Iterator, NamedTuple
+
+# Root of the client data tree; every client (tenant) is a `Company X` folder directly below it.
+# Deployments mount one shared volume here for the API, the workers and the watcher
+CLIENT_DATA_ROOT = os.path.normpath(
+    os.getenv("CLIENT_DATA_ROOT", os.path.join(os.path.dirname(__file__), "routes", "Client Data")))
+
+class FileStat(NamedTuple):
+    """Stat fingerprint of a .docx file as stored on `documents`."""
+    path: str
+    filename: str
+    size: int
+    mtime_ns: int
+    inode: int
+
+class FolderChanges(NamedTuple):
+    """Result of comparing a folder tree against the stored fingerprints."""
+    added: list
+    changed: list
+    deleted: list
+
+    def __bool__(self):
+        return bool(self.added or self.changed or self.deleted)
+
+def scan_docx_files(root: str, recursive: bool = True, failed: set = None) -> Iterator[FileStat]:
+    """
+    Yield a FileStat for every .docx file below `root` (or only in it) using os.scandir.
+    Folders that cannot be listed and entries that cannot be stat'ed (removed meanwhile,
+    permissions) are skipped and added to `failed`, so callers can tell them from deletions.
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if recursive:
+                                stack.append(entry.path)
+                        elif entry.name.endswith(".docx") and entry.is_file():
+                            stats = entry.stat()
+                            yield FileStat(entry.path, entry.name, stats.st_size, stats.st_mtime_ns, stats.st_ino)
+                    except OSError as e:
+                        print(f"Error reading {entry.path}: {e}")
+                        if failed is not None:
+                            failed.add(entry.path)
+        except OSError as e:
+            print(f"Error scanning folder {current}: {e}")
+            if failed is not None:
+                failed.add(current)
+
+def diff_folder(root: str, known: dict, recursive: bool = True) -> FolderChanges:
+    """
+    Compare the .docx files below `root` (or only in it) with `known`, a mapping of path to
+    the stored (size, mtime_ns, inode) fingerprint. Only stat calls are made; nothing is
+    read or written. Known files in folders (or entries) that could not be read are not
+    reported as deleted; they are compared again on the next sync.
+    """
+    added, changed = [], []
+    seen, failed = set(), set()
+    for file in scan_docx_files(root, recursive, failed):
+        seen.add(file.path)
+        fingerprint = known.get(file.path)
+        if fingerprint is None and file.path not in known:
+            added.append(file)
+        elif fingerprint != (file.size, file.mtime_ns, file.inode):
+            changed.append(file)
+
+    below_failed = tuple(path + os.sep for path in failed)
+    deleted = [path for path in known
+               if path not in seen and path not in failed and not path.startswith(below_failed)]
+    return FolderChanges(added, changed, deleted)
+
+def folder_and_ancestors(folder: str) -> Iterator[str]:
+    """Yield `folder` and every folder above it, up to the filesystem root."""
+    folder = folder.rstrip(os.sep) or os.sep
+    while True:
+        yield folder
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            return
+        folder = parent
@@ -0,0 +1,182 @@
+"""
+Tenant-aware scheduling of the child jobs of folder fan-outs.
+
+Every client (tenant) is a `Company X` folder directly below the client data root. The
+children of a large fan-out are not sent to Celery at once: they wait in a Redis list per
+tenant, and the dispatcher (`python -m app.scheduling`) moves them to the worker queues in
+weighted round-robin order, while fewer than SCHEDULER_MAX_IN_FLIGHT dispatched children
+are unfinished. A client tagging 50k documents then holds only its share of the workers,
+and the next job of another client starts within one round instead of after the backlog.
+
+Requests that ask for it (`interactive=true` on the document classification routes) skip
+the tenant queues and go to the interactive queues, which workers poll before their other
+queues, as long as they have at most SCHEDULER_INTERACTIVE_MAX_CHILDREN children. Larger
+ones and background work (the watcher's fingerprinting and embedding) always take their
+tenant's turn, however few children they have.
+
+    python -m app.scheduling
+"""
+import bisect
+import json
+import os
+import time
+from app.cache import get_redis, get_async_redis
+from app.pipeline import llm_queue_full
+from app.scanner import CLIENT_DATA_ROOT
+
+SCHEDULER_MAX_IN_FLIGHT = int(os.getenv("SCHEDULER_MAX_IN_FLIGHT", "64"))
+# Largest interactive request, so the flag cannot be used to move bulk work past other tenants
+SCHEDULER_INTERACTIVE_MAX_CHILDREN = int(os.getenv("SCHEDULER_INTERACTIVE_MAX_CHILDREN", "4"))
+# Dispatched children that did not report back within this time (a lost task) stop
+# counting as in flight, so they cannot stall the dispatcher
+SCHEDULER_IN_FLIGHT_TIMEOUT = float(os.getenv("SCHEDULER_IN_FLIGHT_TIMEOUT", "3600"))
+SCHEDULER_TICK_SECONDS = 0.2
+DEFAULT_TENANT = "default"
+PREFIX = "scheduler"
+
+def parse_weights(spec: str) -> dict:
+    """Tenant weights from "Company A=3,Company B=2"; tenants that are not listed weigh 1."""
+    weights = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        tenant, _, weight = part.rpartition("=")
+        weights[tenant.strip()] = max(1, int(weight))
+    return weights
+
+# Children a tenant may dispatch per round; a tenant with weight 3 gets three times the
+# workers of a tenant with weight 1 while both have work waiting
+SCHEDULER_TENANT_WEIGHTS = parse_weights(os.getenv("SCHEDULER_TENANT_WEIGHTS", ""))
+
+TENANTS_KEY = f"{PREFIX}:tenants"
+IN_FLIGHT_KEY = f"{PREFIX}:in_flight"
+
+def _tenant_key(tenant: str) -> str:
+    return f"{PREFIX}:tenant:{tenant}"
+
+def _remaining_key(job_id: int) -> str:
+    return f"{PREFIX}:remaining:{job_id}"
+
+def tenant_of(path: str, root: str = CLIENT_DATA_ROOT) -> str:
+    """The tenant a folder belongs to: its first folder below the client data root."""
+    relative = os.path.relpath(os.path.normpath(path), os.path.normpath(root))
+    tenant = relative.split(os.sep, 1)[0]
+    return DEFAULT_TENANT if tenant in (".", "..") else tenant
+
+def track_fan_out(job_id: int, children: int):
+    """Start counting down the unfinished children of a fan-out."""
+    get_redis().set(_remaining_key(job_id), children)
+
+def enqueue(tenant: str, children: list):
+    """Queue (child_id, signature dict) pairs of a fan-out for the dispatcher, behind the tenant's earlier work."""
+    pipeline = get_redis().pipeline()
+    pipeline.rpush(_tenant_key(tenant), *(json.dumps({"child_id": child_id, "signature": signature})
+                                          for child_id, signature in children))
+    pipeline.sadd(TENANTS_KEY, tenant)
+    pipeline.execute()
+
+def finish_child(job_id: int, child_id: int) -> int:
+    """Count a child of a fan-out as finished and free its dispatch slot; returns the children left."""
+    pipeline = get_redis().pipeline()
+    pipeline.zrem(IN_FLIGHT_KEY, child_id)
+    pipeline.decr(_remaining_key(job_id))
+    remaining = pipeline.execute()[1]
+    if remaining <= 0:
+        get_redis().delete(_remaining_key(job_id))
+    return remaining
+
+class Dispatcher:
+    """
+    Moves queued children to the worker queues with `send(signature)`, visiting the tenants
+    with work waiting in turn. A visit lasts until the tenant dispatched its weight in
+    children, across calls when the in-flight limit leaves room for fewer at a time.
+    """
+    def __init__(self, send, max_in_flight: int = SCHEDULER_MAX_IN_FLIGHT, weights: dict = None):
+        self.send = send
+        self.max_in_flight = max_in_flight
+        self.weights = SCHEDULER_TENANT_WEIGHTS if weights is None else weights
+        self._current = ""  # tenant being visited
+        self._credit = 0    # children it may still dispatch in this visit
+
+    def dispatch(self) -> int:
+        """Dispatch children until the in-flight limit is reached or nothing waits; returns the number sent."""
+        client = get_redis()
+        now = time.time()
+        client.zremrangebyscore(IN_FLIGHT_KEY, "-inf", now - SCHEDULER_IN_FLIGHT_TIMEOUT)
+        room = self.max_in_flight - client.zcard(IN_FLIGHT_KEY)
+        sent = 0
+        while room > 0:
+            tenants = sorted(t.decode() for t in client.smembers(TENANTS_KEY))
+            if not tenants:
+                break
+            find = bisect.bisect_left if self._credit > 0 else bisect.bisect_right
+            start = find(tenants, self._current)
+            progressed = False
+            for tenant in tenants[start:] + tenants[:start]:
+                if tenant != self._current or self._credit <= 0:
+                    self._current, self._credit = tenant, self.weights.get(tenant, 1)
+                wanted = min(self._credit, room)
+                items = client.lpop(_tenant_key(tenant), wanted) or []
+                if len(items) < wanted:
+                    self._credit = 0
+                if not items:
+                    self._retire(client, tenant)
+                    continue
+
+                for position, raw in enumerate(items):
+                    item = json.loads(raw)
+                    client.zadd(IN_FLIGHT_KEY, {item["child_id"]: now})
+                    try:
+                        self.send(item["signature"])
+                    except Exception:
+                        client.zrem(IN_FLIGHT_KEY, item["child_id"])
+                        client.lpush(_tenant_key(tenant), *reversed(items[position:]))
+                        raise
+                self._credit = max(0, self._credit - len(items))
+                room -= len(items)
+                sent += len(items)
+                progressed = True
+                if room <= 0:
+                    break
+            if not progressed:
+                break
+        return sent
+
+    @staticmethod
+    def _retire(client, tenant: str):
+        """Drop a tenant without waiting work from the rotation, unless work arrived meanwhile."""
+        client.srem(TENANTS_KEY, tenant)
+        if client.llen(_tenant_key(tenant)):
+            client.sadd(TENANTS_KEY, tenant)
+
+def get_tenant_backlog() -> dict:
+    """Children waiting per tenant."""
+    client = get_redis()
+    return {t.decode(): client.llen(_tenant_key(t.decode())) for t in client.smembers(TENANTS_KEY)}
+
+async def get_scheduler_stats() -> dict:
+    """Children waiting per tenant and children dispatched but not finished, for /jobs/pipeline_stats."""
+    client = get_async_redis()
+    tenants = sorted(t.decode() for t in await client.smembers(TENANTS_KEY))
+    return {
+        "waiting": {tenant: await client.llen(_tenant_key(tenant)) for tenant in tenants},
+        "in_flight": await client.zcard(IN_FLIGHT_KEY),
+        "max_in_flight": SCHEDULER_MAX_IN_FLIGHT,
+        "weights": SCHEDULER_TENANT_WEIGHTS,
+    }
+
+def run():
+    from app.tasks import celery
+    dispatcher = Dispatcher(lambda signature: celery.signature(signature).apply_async())
+    print(f"Dispatching child jobs, at most {dispatcher.max_in_flight} in flight")
+    while True:
+        try:
+            # Held back while the LLM stage is saturated, so waiting children stay in the
+            # tenant queues instead of piling up as delayed retries on the extract workers
+            sent = 0 if llm_queue_full() else dispatcher.dispatch()
+        except Exception as e:  # broker or Redis unavailable; retried on the next tick
+            print(f"Could not dispatch child jobs: {e}")
+            sent = 0
+        if not sent:
+            time.sleep(SCHEDULER_TICK_SECONDS)
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,66 @@
+import difflib
+import os
+import re
+import threading
+import time
+from app.db import get_tag_ids, get_tags_version
+from app.metrics import TAG_MATCHES
+
+# Tag names from the LLM are matched to the vocabulary after normalization, and failing
+# that to the closest tag whose similarity ratio reaches TAG_MATCH_CUTOFF
+TAG_MATCH_CUTOFF = float(os.getenv("TAG_MATCH_CUTOFF", "0.85"))
+# How often a process checks whether the tags table changed
+TAG_VOCABULARY_CHECK_SECONDS = float(os.getenv("TAG_VOCABULARY_CHECK_SECONDS", "30"))
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+def normalize_tag(name: str) -> str:
+    """Case, punctuation and spacing insensitive form of a tag name: "HR-documents " -> "hr documents"."""
+    return _NON_WORD.sub(" ", name.casefold().replace("&", " and ")).strip()
+
+class TagVocabulary:
+    """The tags table as name -> id, with lookup of the tag names an LLM answers with."""
+    def __init__(self, tag_ids: dict, version: str):
+        self.ids = tag_ids
+        self.names = list(tag_ids)
+        self.version = version
+        self._by_normalized = {normalize_tag(name): name for name in tag_ids}
+
+    def match(self, name: str) -> str | None:
+        """The tag meant by `name`: exactly, after normalization or by fuzzy match; None when unknown."""
+        if name in self.ids:
+            TAG_MATCHES.labels("exact").inc()
+            return name
+        normalized = normalize_tag(name)
+        if normalized in self._by_normalized:
+            TAG_MATCHES.labels("normalized").inc()
+            return self._by_normalized[normalized]
+        close = difflib.get_close_matches(normalized, self._by_normalized, n=1, cutoff=TAG_MATCH_CUTOFF)
+        TAG_MATCHES.labels("fuzzy" if close else "unknown").inc()
+        return self._by_normalized[close[0]] if close else None
+
+    def resolve(self, names) -> list:
+        """Known tags for a list of tag names, without duplicates; unknown names are dropped."""
+        matched = (self.match(name) for name in names or [] if isinstance(name, str))
+        return list(dict.fromkeys(name for name in matched if name is not None))
+
+    def tag_ids(self, names) -> list:
+        return [self.ids[name] for name in self.resolve(names)]
+
+_vocabulary = {"current": None, "checked": 0.0}
+_lock = threading.Lock()
+
+def get_tag_vocabulary() -> TagVocabulary:
+    """
+    The tag vocabulary of this process. The tags table's version is checked at most every
+    TAG_VOCABULARY_CHECK_SECONDS and the tags are reloaded only when it changed.
+    """
+    with _lock:
+        current, now = _vocabulary["current"], time.monotonic()
+        if current is not None and now - _vocabulary["checked"] < TAG_VOCABULARY_CHECK_SECONDS:
+            return current
+        version = get_tags_version()
+        if current is None or current.version != version:
+            current = _vocabulary["current"] = TagVocabulary(get_tag_ids(), version)
+        _vocabulary["checked"] = now
+        return current
@@ -1,55 +1,182 @@
 import os
-from datetime import datetime
-from celery import Celery
-from app.db import update_job, upsert_folder_count, create_job, insert_document, get_all_tags, insert_tag_document, add_summary_for_document
-from openai import OpenAI
-from app.preprocessing import extract_text_from_docx
-import json
+import time
+import numpy as np
+from itertools import batched, islice
+from celery import Celery, chain
+from app.db import INGEST_BATCH_SIZE, JOB_COMPACT_AFTER_MINUTES, create_job, update_job, update_jobs, create_child_jobs, compact_jobs, get_unembedded_documents_in_folder, get_unfingerprinted_documents_in_folder, save_document_fingerprints, share_duplicate_results, get_document_id_by_path, replace_document_chunks, get_live_vector_rows, record_preclassification, evict_llm_cache, rollup_job, upsert_folder_count, insert_documents_batch, get_document_fingerprints_in_folder, delete_documents_by_path, get_untagged_documents_in_folder, get_unsummarized_documents_in_folder, get_unanalyzed_documents_in_folder, insert_document_tags, add_summary_for_document, save_document_analyses, adjust_folder_counts, recount_folders_in_subtree, save_document_contents
+from app.scanner import FolderChanges, scan_docx_files, diff_folder, folder_and_ancestors
+from app.text_cache import get_document, get_document_body
+from app import llm_cache
+from app.cache import invalidate_folders, invalidate_documents
+from app.pipeline import (BROKER_URL, RESULT_BACKEND_URL, EXTRACT_QUEUE, LLM_QUEUE, INTERACTIVE_QUEUES,
+                          BACKPRESSURE_RETRY_SECONDS, BACKPRESSURE_MAX_RETRIES, llm_queue_full)
+from app.scheduling import SCHEDULER_INTERACTIVE_MAX_CHILDREN, tenant_of, track_fan_out, enqueue, finish_child
+from app.chunking import chunk_text
+from app.embeddings import embed_texts
+from app.fingerprint import simhash
+from app.vector_index import get_vector_index
+from app.tags import get_tag_vocabulary
+from app.classifier import PRECLASSIFIER_ENABLED, classify, should_shadow
+from app.llm import tag_document, analyze_document, analyze_batches, pack_documents, condense_text, summarize_text
 
-OpenAI.api_key = os.getenv("OPENAI_API_KEY")
-
-celery = Celery('app', broker='redis://redis:6379/0', include=['app.tasks']
+celery = Celery('app', broker=BROKER_URL, backend=RESULT_BACKEND_URL, include=['app.tasks']
 )
+ANALYZE_DOCUMENTS_PER_JOB = int(os.getenv("ANALYZE_DOCUMENTS_PER_JOB", "20"))
+EMBED_DOCUMENTS_PER_JOB = int(os.getenv("EMBED_DOCUMENTS_PER_JOB", "50"))
+FINGERPRINT_DOCUMENTS_PER_JOB = int(os.getenv("FINGERPRINT_DOCUMENTS_PER_JOB", "100"))
+EMBED_CHUNK_TOKENS = int(os.getenv("EMBED_CHUNK_TOKENS", "400"))
+VECTOR_INDEX_TRAIN_MINUTES = int(os.getenv("VECTOR_INDEX_TRAIN_MINUTES", "30"))
+SNIPPET_CHARS = 300
+
+celery.conf.task_routes = {
+    **{f"app.tasks.{name}": {"queue": EXTRACT_QUEUE} for name in (
+        "update_folder_count", "update_folder_files_metadata", "sync_folders_task", "extract_documents_task",
+        "fingerprint_documents_task", "embed_documents_task", "train_vector_index_task")},
+    **{f"app.tasks.{name}": {"queue": LLM_QUEUE} for name in (
+        "tag_documents_task", "summarize_document", "analyze_document_task", "analyze_documents_batch_task")},
+}
+# Tasks are long; a worker only takes a task when it has a free slot, so queue lengths
+# show the real backlog of each stage
+celery.conf.worker_prefetch_multiplier = 1
+# Workers take from their queues in the order of --queues, so the interactive queues listed
+# first are served before the bulk queues
+celery.conf.broker_transport_options = {"queue_order_strategy": "priority"}
+
+celery.conf.beat_schedule = {
+    "compact-jobs": {"task": "app.tasks.compact_jobs_task", "schedule": JOB_COMPACT_AFTER_MINUTES * 60},
+    "train-vector-index": {"task": "app.tasks.train_vector_index_task", "schedule": VECTOR_INDEX_TRAIN_MINUTES * 60},
+    "evict-llm-cache": {"task": "app.tasks.evict_llm_cache_task", "schedule": 24 * 60 * 60},
+}
 
 @celery.task
 def update_folder_count(job_id: int, path: str):
     """
-    Only count .docx files in the folder and update `folders` table.
+    Only count .docx files in the folder tree and update `folders` table.
     Does not insert document metadata.
     """
     try:
-        files = [
-            f for f in os.listdir(path)
-            if f.endswith(".docx") and os.path.isfile(os.path.join(path, f))
-        ]
-        count = len(files)
+        count = sum(1 for _ in scan_docx_files(path))
 
         upsert_folder_count(path, count, job_id)
+        invalidate_folders([path])
         update_job(job_id, status="done", result=f"Counted {count} documents")
         return f"Counted {count} documents"
 
     except Exception as e:
-        update_job(job_id, status="failed", result=str(e), doc_count=0)
+        update_job(job_id, status="failed", result=str(e))
         raise
 
 @celery.task
-def update_folder_files_metadata(job_id: int, path: str):
+def update_folder_files_metadata(job_id: int, path: str, batch_size: int = INGEST_BATCH_SIZE):
     """
-    Process the folder to extract metadata for each .docx file and insert into `documents` table.
+    Scan the folder tree and sync .docx metadata into the `documents` table.
+    Only added and changed files are written (in batches of `batch_size`, each in a single
+    transaction) and deleted files are removed, so rescanning an unchanged tree writes nothing.
     """
     try:
-        files = [f for f in os.listdir(path)]
+        update_job(job_id, status="running")
+        started = time.perf_counter()
+        changes = diff_folder(path, get_document_fingerprints_in_folder(path))
 
-        for file in files:
-            filepath = os.path.join(path, file)
-            size_kb = os.path.getsize(filepath) / 1024
-            modified_time = datetime.fromtimestamp(os.path.getmtime(filepath))
-            file_job_id = create_job(status="PENDING")
-            insert_document(file_job_id, filepath, file, size_kb, modified_time)
-            update_job(file_job_id, status="done", result="Inserted document metadata")
+        for batch in batched(changes.added + changes.changed, batch_size):
+            insert_documents_batch(list(batch), job_id)
+        if changes.deleted:
+            delete_documents_by_path(changes.deleted)
+        invalidate_documents([f.path for f in changes.added + changes.changed] + changes.deleted)
+        if changes.added or changes.changed:
+            fingerprint_folder_task.delay(create_job(kind="fingerprint"), path)
+            embed_folder_task.delay(create_job(kind="embed"), path)
 
-        update_job(job_id, status="done", result=f"Inserted metadata for {len(files)} documents")
-        return f"Inserted metadata for {len(files)} documents"
+        elapsed = time.perf_counter() - started
+        written = len(changes.added) + len(changes.changed) + len(changes.deleted)
+        rate = written / elapsed if elapsed > 0 else 0
+        result = (f"Added {len(changes.added)}, updated {len(changes.changed)} and removed "
+                  f"{len(changes.deleted)} documents ({rate:.0f} rows/s)")
+        update_job(job_id, status="done", result=result)
+        return result
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def sync_folders_task(folders: list, recount: bool = False):
+    """
+    Apply the filesystem changes reported by app.watcher. `folders` is a list of
+    (path, recursive) pairs: the `documents` rows in each folder (or below it) are synced
+    with the disk. The counts of the counted folders below a recursively synced folder
+    (a directory created, moved or deleted) are recomputed from those rows, and the counted
+    folders above a folder move by the documents added and removed. A folder synced on its
+    own whose files were never ingested does not move the counts: the files were counted
+    from the disk already and would come back as added. With `recount`, the counts of the
+    counted folders below each folder are recomputed instead, which the watcher's
+    reconciliation passes use to correct any drift.
+    """
+    job_id = None
+    deltas = {}
+    recounted = [folder for folder, _ in folders] if recount else []
+    paths = []
+    try:
+        for folder, recursive in folders:
+            known = get_document_fingerprints_in_folder(folder, recursive)
+            if os.path.isdir(folder):
+                changes = diff_folder(folder, known, recursive)
+            else:
+                changes = FolderChanges([], [], list(known))
+            if not changes:
+                continue
+
+            if job_id is None:
+                job_id = create_job(status="running", kind="sync")
+            for batch in batched(changes.added + changes.changed, INGEST_BATCH_SIZE):
+                insert_documents_batch(list(batch), job_id)
+            if changes.deleted:
+                delete_documents_by_path(changes.deleted)
+            if changes.added or changes.changed:
+                fingerprint_folder_task.delay(create_job(kind="fingerprint"), folder)
+                embed_folder_task.delay(create_job(kind="embed"), folder)
+
+            paths += [f.path for f in changes.added + changes.changed] + changes.deleted
+            if recount:
+                continue
+            if recursive:
+                recounted.append(folder)
+            if (known or recursive) and len(changes.added) != len(changes.deleted):
+                # A recursively synced folder itself is recounted with its subtree
+                for ancestor in islice(folder_and_ancestors(folder), 1 if recursive else 0, None):
+                    deltas[ancestor] = deltas.get(ancestor, 0) + len(changes.added) - len(changes.deleted)
+
+        counted = [path for folder in recounted for path in recount_folders_in_subtree(folder)]
+        counted += adjust_folder_counts(deltas)
+        invalidate_documents(paths)
+        invalidate_folders(counted)
+
+        result = f"Synced {len(paths)} documents and {len(counted)} folder counts"
+        if job_id is not None:
+            update_job(job_id, status="done", result=result)
+        return result
+
+    except Exception as e:
+        if job_id is not None:
+            update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task(bind=True, max_retries=BACKPRESSURE_MAX_RETRIES)
+def extract_documents_task(self, job_id: int, paths: list):
+    """
+    Extraction stage in front of an LLM task: parse the documents into the text cache, so
+    the LLM worker only reads cached text. Held back while the LLM queues are full, and
+    failed once that took BACKPRESSURE_MAX_RETRIES retries.
+    """
+    if llm_queue_full():
+        if self.request.retries >= self.max_retries:
+            update_job(job_id, status="failed", result="The LLM queues stayed full")
+            raise RuntimeError(f"The LLM queues stayed full for {self.max_retries} retries")
+        raise self.retry(countdown=BACKPRESSURE_RETRY_SECONDS)
+    try:
+        for path in paths:
+            get_document_body(path)
+        return f"Extracted {len(paths)} documents"
 
     except Exception as e:
         update_job(job_id, status="failed", result=str(e))
@@ -58,49 +185,30 @@ def update_folder_files_metadata(job_id: int, path: str):
 @celery.task
 def tag_documents_task(job_id: int, document_id: int, path: str):
     """
-    Placeholder for document tagging logic using OpenAI.
-    """
-    try:
-        client = OpenAI()
-        text = extract_text_from_docx(path)
-        all_tags = get_all_tags()
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an expert document classifier. "
-                        "Given the content of a document, assign the most relevant tags "
-                        "from the provided list. Only select tags that are clearly applicable."
-                        "Make sure you write the summary only in Dutch."
-                        "Do not add any prefixes or suffixes to the summary."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"Document Content:\n{text}\n\n"
-                        f"Available Tags: {', '.join(all_tags)}\n\n"
-                        "Return the tags as a JSON array."
-                    )
-                }
-            ],
-            max_tokens=150,
-            temperature=0
-        )
-        tags = response.choices[0].message.content
-        tags = json.loads(tags)
-
-        print(f"Tags for document {document_id}: {tags}")
-
-        for tag in tags:
-            print(f"Inserting tag '{tag}' for document ID {document_id}")  # Debugging line
-            insert_tag_document(document_id, tag)
-
-        update_job(job_id, status="done", result=f"Tagged document with {len(tags)} tags")
-        return f"Tagged document with {len(tags)} tags"
+    Tag a document, locally when the pre-classifier is confident and with OpenAI otherwise.
+    A sample of the confident documents also goes to OpenAI to measure agreement.
+    """
+    try:
+        content_hash, text = get_document(path)
+        if content_hash is None:
+            return _unreadable(job_id, path)
+        vocabulary = get_tag_vocabulary()
+        tags = vocabulary.names
+
+        local = classify(text, tags) if PRECLASSIFIER_ENABLED else None
+        llm_tags = None
+        if local is None or not local.confident or should_shadow():
+            llm_tags = llm_cache.cached_call("tag", content_hash, lambda: tag_document(condense_text(text), tags), tags)
+        if local is not None:
+            record_preclassification(document_id, local, llm_tags)
+        tag_ids = vocabulary.tag_ids(local.tags if local is not None and local.confident else llm_tags)
+
+        insert_document_tags([document_id] * len(tag_ids), tag_ids)
+        invalidate_documents([path] + share_duplicate_results([document_id], summary=False))
+
+        source = "locally" if llm_tags is None else "with OpenAI"
+        update_job(job_id, status="done", result=f"Tagged document {source} with {len(tag_ids)} tags")
+        return f"Tagged document {source} with {len(tag_ids)} tags"
 
     except Exception as e:
         update_job(job_id, status="failed", result=str(e))
@@ -109,41 +217,335 @@ def tag_documents_task(job_id: int, document_id: int, path: str):
 @celery.task
 def summarize_document(job_id: int, path: str):
     """
-    Placeholder for document summarization logic using OpenAI.
-    """
-    try:
-        client = OpenAI()
-        text = extract_text_from_docx(path)
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an expert document summarizer. "
-                        "Given the content of a document, provide a concise summary "
-                        "highlighting the key points."
-                        "Make sure you write the summary only in Dutch."
-                        "Do not add any prefixes or suffixes to the summary."
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": f"Document Content:\n{text}\n\nProvide a concise summary."
-                }
-            ],
-            max_tokens=150,
-            temperature=0
-        )
-        summary = response.choices[0].message.content
-        print(f"Summary: {summary}")
+    Summarize a document with OpenAI, reusing the summary of an identical document when cached.
+    """
+    try:
+        content_hash, text = get_document(path)
+        if content_hash is None:
+            return _unreadable(job_id, path)
+        summary = llm_cache.cached_call("summary", content_hash, lambda: summarize_text(text))
 
         add_summary_for_document(path, summary)
+        invalidate_documents([path] + share_duplicate_results([get_document_id_by_path(path)], tags=False))
         update_job(job_id, status="done", result="Added document summary")
 
         return "Added document summary"
 
     except Exception as e:
         update_job(job_id, status="failed", result=str(e))
-        raise
\ No newline at end of file
+        raise
+
+@celery.task
+def analyze_document_task(job_id: int, document_id: int, path: str):
+    """
+    Tag and summarize a document with a single OpenAI call, or none when the analysis of an
+    identical document is cached.
+    """
+    try:
+        content_hash, text = get_document(path)
+        if content_hash is None:
+            return _unreadable(job_id, path)
+        vocabulary = get_tag_vocabulary()
+        tags = vocabulary.names
+        analysis = llm_cache.cached_call("analyze", content_hash, lambda: analyze_document(condense_text(text), tags), tags)
+
+        tag_ids = vocabulary.tag_ids(analysis["tags"])
+
+        save_document_analyses([(document_id, tag_ids, analysis["summary"])])
+        invalidate_documents([path] + share_duplicate_results([document_id]))
+        update_job(job_id, status="done", result=f"Analyzed document with {len(tag_ids)} tags")
+        return f"Analyzed document with {len(tag_ids)} tags"
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def analyze_documents_batch_task(job_id: int, documents: list):
+    """
+    Tag and summarize several documents, packing short ones into shared OpenAI requests up to
+    the token budget, sending the requests concurrently and writing all results back in one transaction.
+    Cached analyses are reused and identical documents are sent only once.
+    `documents` is a list of (document_id, path) pairs.
+    """
+    try:
+        vocabulary = get_tag_vocabulary()
+        tags = vocabulary.names
+        loaded = [(document_id, *get_document(path)) for document_id, path in documents]
+        unreadable = sum(1 for _, content_hash, _ in loaded if content_hash is None)
+        loaded = [document for document in loaded if document[1] is not None]
+        cached = llm_cache.lookup("analyze", [content_hash for _, content_hash, _ in loaded], tags)
+
+        analyses = {}
+        pending = {}  # content hash -> [(document_id, text)]
+        for document_id, content_hash, text in loaded:
+            if content_hash in cached:
+                analyses[document_id] = cached[content_hash]
+            else:
+                pending.setdefault(content_hash, []).append((document_id, text))
+
+        requests = [(copies[0][0], condense_text(copies[0][1])) for copies in pending.values()]
+        fresh = analyze_batches(pack_documents(requests), tags) if requests else {}
+        unparsed = 0  # left unanalyzed, so the next run tries again
+        for copies in pending.values():
+            if copies[0][0] not in fresh:
+                unparsed += len(copies)
+                continue
+            for document_id, _ in copies:
+                analyses[document_id] = fresh[copies[0][0]]
+        llm_cache.store("analyze", {key: fresh[copies[0][0]] for key, copies in pending.items()
+                                    if copies[0][0] in fresh}, tags)
+
+        save_document_analyses([(document_id, vocabulary.tag_ids(a["tags"]), a["summary"])
+                                for document_id, a in analyses.items()])
+        invalidate_documents([path for _, path in documents] + share_duplicate_results(list(analyses)))
+        result = (f"Analyzed {len(analyses)} documents" + (f", {unreadable} could not be read" if unreadable else "")
+                  + (f", {unparsed} got no valid analysis" if unparsed else ""))
+        update_job(job_id, status="done", result=result)
+        return result
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def fingerprint_documents_task(job_id: int, documents: list):
+    """
+    Hash the content and SimHash the text of several documents, file each under its cluster
+    of exact or near duplicates and store the text for full-text search. `documents` is a
+    list of (document_id, path) pairs.
+    """
+    try:
+        fingerprints = []
+        contents = []
+        for document_id, path in documents:
+            content_hash, body = get_document_body(path)
+            if content_hash is None:
+                continue  # left unfingerprinted, so the next run tries again
+            fingerprints.append((document_id, content_hash, simhash(body)))
+            contents.append(body)
+
+        duplicate_of = save_document_fingerprints(fingerprints) if fingerprints else {}
+        save_document_contents([document_id for document_id, _, _ in fingerprints], contents)
+        invalidate_documents([path for _, path in documents])
+
+        result = f"Fingerprinted {len(fingerprints)} documents, {len(duplicate_of)} duplicates"
+        if len(fingerprints) < len(documents):
+            result += f", {len(documents) - len(fingerprints)} could not be read"
+        update_job(job_id, status="done", result=result)
+        return result
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def embed_documents_task(job_id: int, documents: list):
+    """
+    Chunk and embed several documents, append the vectors to the vector index and replace
+    the documents' chunk rows. `documents` is a list of (document_id, path) pairs.
+    """
+    try:
+        chunks = []
+        embedded = []  # documents that could be read; the others keep their chunks and are retried next run
+        for document_id, path in documents:
+            content_hash, text = get_document(path)
+            if content_hash is None:
+                continue
+            embedded.append(document_id)
+            for index, chunk in enumerate(chunk_text(text, EMBED_CHUNK_TOKENS)):
+                chunks.append((document_id, index, chunk))
+
+        rows = get_vector_index().append(embed_texts([chunk for _, _, chunk in chunks])) if chunks else []
+        replace_document_chunks(embedded, [(document_id, index, " ".join(chunk.split())[:SNIPPET_CHARS], row)
+                                           for (document_id, index, chunk), row in zip(chunks, rows)])
+
+        result = f"Embedded {len(chunks)} chunks of {len(embedded)} documents"
+        if len(embedded) < len(documents):
+            result += f", {len(documents) - len(embedded)} could not be read"
+        update_job(job_id, status="done", result=result)
+        return result
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def train_vector_index_task():
+    """
+    Periodic (celery beat) retraining of the vector index IVF once enough vectors were
+    added since the last training.
+    """
+    live_rows = get_live_vector_rows()
+    index = get_vector_index()
+    if not index.needs_training(len(live_rows)):
+        return "Vector index is up to date"
+    index.train(np.array(live_rows, dtype=np.int64))
+    return f"Trained vector index on {len(live_rows)} vectors"
+
+# -- folder-level fan-out --
+
+@celery.task
+def child_finished_task(job_id: int, child_id: int):
+    """
+    Callback (and error callback) of every child of a fan-out; the last one to finish rolls
+    the children's progress up into the parent job.
+    """
+    if finish_child(job_id, child_id) <= 0:
+        rollup_job(job_id)
+
+def _unreadable(job_id: int, path: str) -> str:
+    """Fail the job of a document that could not be read or parsed, instead of processing empty text."""
+    update_job(job_id, status="failed", result=f"Could not read {path}")
+    return f"Could not read {path}"
+
+def _cluster_representatives(query, path: str, summary: bool = True, tags: bool = True) -> list:
+    """
+    The documents below `path` still matched by `query` (a get_un*_documents_in_folder
+    function) after copying results from processed duplicates, one per duplicate cluster.
+    The remaining duplicates receive the results once their representative is processed.
+    """
+    pending = query(path)
+    if pending:
+        invalidate_documents(share_duplicate_results([document_id for document_id, _ in pending], summary, tags))
+    return query(path, one_per_cluster=True)
+
+def _interactive(signature):
+    """Send the tasks of a child to the interactive queue of the queue they are routed to."""
+    for task in signature.tasks if signature.task == "celery.chain" else [signature]:
+        task.set(queue=INTERACTIVE_QUEUES[celery.conf.task_routes[task.task]["queue"]])
+    return signature
+
+def _fan_out(job_id: int, path: str, task, argument_lists: list, label: str, extract_paths: list = None,
+             interactive: bool = False) -> str:
+    """
+    Run `task` once per argument list as child jobs of the job for folder `path`. The parent
+    job is marked running and is rolled up once every child has finished, whether it
+    succeeded or not. With `extract_paths` (a list of paths per argument list) each child
+    first extracts its documents on the extract queue and only then enters the task's queue.
+
+    An `interactive` request of up to SCHEDULER_INTERACTIVE_MAX_CHILDREN children goes to
+    the interactive queues at once; everything else waits in its tenant's queue for the
+    dispatcher (see app.scheduling).
+    """
+    if not argument_lists:
+        update_job(job_id, status="done", result=f"No documents left for {label}")
+        return f"No documents left for {label}"
+
+    child_ids = create_child_jobs(job_id, len(argument_lists))
+    update_job(job_id, status="running", result=f"Started {len(child_ids)} {label} jobs")
+
+    try:
+        children = []
+        for position, (child_id, arguments) in enumerate(zip(child_ids, argument_lists)):
+            steps = [task.si(child_id, *arguments)]
+            if extract_paths is not None:
+                steps.insert(0, extract_documents_task.si(child_id, extract_paths[position]))
+            # A failed step ends the child, so exactly one of these callbacks runs
+            steps[-1].link(child_finished_task.si(job_id, child_id))
+            for step in steps:
+                step.link_error(child_finished_task.si(job_id, child_id))
+            children.append((child_id, chain(*steps) if len(steps) > 1 else steps[0]))
+
+        track_fan_out(job_id, len(children))
+        if interactive and len(children) <= SCHEDULER_INTERACTIVE_MAX_CHILDREN:
+            for _, child in children:
+                _interactive(child).apply_async()
+        else:
+            enqueue(tenant_of(path), [(child_id, dict(child)) for child_id, child in children])
+    except Exception as e:
+        update_jobs(child_ids, status="failed", result=f"Could not dispatch: {e}")
+        raise
+    return f"Started {len(child_ids)} {label} jobs"
+
+@celery.task
+def tag_folder_task(job_id: int, path: str, interactive: bool = False):
+    """
+    Fan out tagging of every untagged document in the folder tree as child jobs.
+    """
+    try:
+        documents = _cluster_representatives(get_untagged_documents_in_folder, path, summary=False)
+        return _fan_out(job_id, path, tag_documents_task, documents, "tagging",
+                        [[file_path] for _, file_path in documents], interactive)
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def summarize_folder_task(job_id: int, path: str, interactive: bool = False):
+    """
+    Fan out summarization of every unsummarized document in the folder tree as child jobs.
+    """
+    try:
+        documents = _cluster_representatives(get_unsummarized_documents_in_folder, path, tags=False)
+        return _fan_out(job_id, path, summarize_document, [(file_path,) for _, file_path in documents], "summarization",
+                        [[file_path] for _, file_path in documents], interactive)
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def analyze_folder_task(job_id: int, path: str, interactive: bool = False):
+    """
+    Fan out combined tagging and summarization of the documents in the folder tree that miss
+    either, as child jobs of up to ANALYZE_DOCUMENTS_PER_JOB documents each.
+    """
+    try:
+        documents = _cluster_representatives(get_unanalyzed_documents_in_folder, path)
+        groups = [(list(group),) for group in batched(documents, ANALYZE_DOCUMENTS_PER_JOB)]
+        return _fan_out(job_id, path, analyze_documents_batch_task, groups, "analysis",
+                        [[file_path for _, file_path in group] for group, in groups], interactive)
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def fingerprint_folder_task(job_id: int, path: str):
+    """
+    Fan out fingerprinting of the documents in the folder tree that are new or changed since
+    they were last fingerprinted, as child jobs of up to FINGERPRINT_DOCUMENTS_PER_JOB documents each.
+    """
+    try:
+        documents = get_unfingerprinted_documents_in_folder(path)
+        groups = [(list(group),) for group in batched(documents, FINGERPRINT_DOCUMENTS_PER_JOB)]
+        return _fan_out(job_id, path, fingerprint_documents_task, groups, "fingerprinting")
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def embed_folder_task(job_id: int, path: str, interactive: bool = False):
+    """
+    Fan out embedding of the documents in the folder tree that are new or changed since
+    they were last embedded, as child jobs of up to EMBED_DOCUMENTS_PER_JOB documents each.
+    """
+    try:
+        documents = get_unembedded_documents_in_folder(path)
+        groups = [(list(group),) for group in batched(documents, EMBED_DOCUMENTS_PER_JOB)]
+        return _fan_out(job_id, path, embed_documents_task, groups, "embedding", interactive=interactive)
+
+    except Exception as e:
+        update_job(job_id, status="failed", result=str(e))
+        raise
+
+@celery.task
+def compact_jobs_task():
+    """
+    Periodic (celery beat) retention: fold finished child jobs into their parent's counters
+    and delete top-level jobs past the retention period.
+    """
+    compacted, deleted = compact_jobs()
+    return f"Compacted {compacted} child jobs and deleted {deleted} jobs"
+
+@celery.task
+def evict_llm_cache_task():
+    """
+    Periodic (celery beat) eviction of cached LLM responses that were not used for
+    LLM_CACHE_MAX_AGE_DAYS, then of the least recently used beyond LLM_CACHE_MAX_ENTRIES.
+    """
+    evicted = evict_llm_cache(llm_cache.LLM_CACHE_MAX_ENTRIES, llm_cache.LLM_CACHE_MAX_AGE_DAYS)
+    return f"Evicted {evicted} cached LLM responses"
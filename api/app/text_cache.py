@@ -0,0 +1,56 @@
+import hashlib
+import os
+from app.db import get_cached_document_text, store_document_text, evict_document_texts
+from app.preprocessing import DOCX_EXTRACTOR, extract_body, format_document_text
+
+TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(1024 ** 3)))
+TEXT_CACHE_EVICT_EVERY = int(os.getenv("TEXT_CACHE_EVICT_EVERY", "500"))
+
+_stores_since_eviction = 0
+
+def hash_file(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def get_document_body(file_path: str) -> tuple:
+    """
+    Return (content_hash, body) of a .docx file, parsing it only if its content hash is not
+    cached yet. The cache holds the body only, so copies under another name share an entry.
+    When the file cannot be read or parsed the hash is None and the body is empty; callers
+    skip such documents. Database errors are raised.
+    """
+    global _stores_since_eviction
+    try:
+        content_hash = hash_file(file_path)
+    except OSError as e:
+        print(f"Error reading {file_path}: {e}")
+        return None, ""
+
+    body = get_cached_document_text(content_hash, DOCX_EXTRACTOR)
+    if body is None:
+        try:
+            body = extract_body(file_path)
+        except Exception as e:  # anything the parsers raise on a missing, corrupt or unsupported file
+            print(f"Error extracting text from {file_path}: {e}")
+            return None, ""
+        store_document_text(content_hash, DOCX_EXTRACTOR, body)
+
+        _stores_since_eviction += 1
+        if _stores_since_eviction >= TEXT_CACHE_EVICT_EVERY:
+            _stores_since_eviction = 0
+            evict_document_texts(TEXT_CACHE_MAX_BYTES)
+
+    return content_hash, body
+
+def get_document(file_path: str) -> tuple:
+    """Return (content_hash, text) of a .docx file, the body with the file name as title (see get_document_body)."""
+    content_hash, body = get_document_body(file_path)
+    return content_hash, format_document_text(file_path, body) if content_hash else ""
+
+def get_document_text(file_path: str) -> str:
+    """Return the extracted text of a .docx file (see get_document); empty when it could not be read."""
+    return get_document(file_path)[1]
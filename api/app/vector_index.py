@@ -0,0 +1,196 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+import numpy as np
+from app.embeddings import embedding_name, embedding_dim
+
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "/data/vector_index")
+VECTOR_NPROBE = int(os.getenv("VECTOR_NPROBE", "16"))
+# Below this many vectors a brute-force scan is fast enough and no IVF is trained
+VECTOR_MIN_TRAIN_ROWS = int(os.getenv("VECTOR_MIN_TRAIN_ROWS", "20000"))
+# Retrain once the untrained tail is this fraction of the trained rows
+VECTOR_RETRAIN_FRACTION = float(os.getenv("VECTOR_RETRAIN_FRACTION", "0.1"))
+_BLOCK_ROWS = 65536
+
+class VectorIndex:
+    """
+    Append-only float16 vector matrix in a memory-mapped file with an IVF (inverted file)
+    index for approximate nearest-neighbour search.
+
+    Rows are never moved or deleted: the owner of the rows (document_chunks.vector_row)
+    decides which rows are live, rows that are no longer live are left out of the IVF
+    lists at the next training and only cost disk space. Rows appended after the last
+    training form a tail that is scanned exhaustively until the index is retrained.
+
+    Writers (Celery workers) serialize appends and training with a file lock; readers
+    (the API) pick up new rows and a new IVF by checking file sizes and modification times.
+    """
+    def __init__(self, directory: str, name: str, dim: int):
+        self.directory = directory
+        self.name = name
+        self.dim = dim
+        self.row_bytes = dim * 2  # float16
+        self.vectors_path = os.path.join(directory, "vectors.f16")
+        self.ivf_path = os.path.join(directory, "ivf.npz")
+        self._matrix = None
+        self._matrix_rows = -1
+        self._ivf = None
+        self._ivf_mtime = None
+
+    # -- writing --
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._check_meta()
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _check_meta(self):
+        meta_path = os.path.join(self.directory, "meta.json")
+        meta = {"name": self.name, "dim": self.dim}
+        if not os.path.exists(meta_path):
+            with open(meta_path, "w") as f:
+                json.dump(meta, f)
+            return
+        with open(meta_path) as f:
+            existing = json.load(f)
+        if existing != meta:
+            raise ValueError(f"Vector index in {self.directory} holds {existing}, not {meta}; "
+                             f"remove it and re-embed the documents")
+
+    def append(self, vectors: np.ndarray) -> list:
+        """Append normalized vectors and return their row numbers."""
+        data = np.ascontiguousarray(vectors, dtype=np.float16)
+        if data.ndim != 2 or data.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got shape {data.shape}")
+        with self._locked():
+            with open(self.vectors_path, "ab") as f:
+                start = f.tell() // self.row_bytes
+                f.write(data.tobytes())
+        return list(range(start, start + len(data)))
+
+    def needs_training(self, live_rows: int) -> bool:
+        """True when there are enough rows for an IVF and the untrained tail has grown too large."""
+        if live_rows < VECTOR_MIN_TRAIN_ROWS:
+            return False
+        trained = self._load_ivf()["trained_rows"] if os.path.exists(self.ivf_path) else 0
+        return self.row_count() - trained > VECTOR_RETRAIN_FRACTION * max(trained, 1)
+
+    def train(self, live_rows: np.ndarray, iterations: int = 10, sample_size: int = 100_000, seed: int = 0):
+        """
+        Train the IVF on the live rows: spherical k-means with about sqrt(n) lists on a
+        sample, then assign every live row to its nearest centroid.
+        """
+        live_rows = np.sort(np.asarray(live_rows, dtype=np.int64))
+        with self._locked():
+            matrix = self._open_matrix()
+            trained_rows = matrix.shape[0]
+            live_rows = live_rows[live_rows < trained_rows]
+            nlist = int(min(max(np.sqrt(len(live_rows)), 1), 65536))
+            rng = np.random.default_rng(seed)
+
+            sample = np.sort(rng.choice(live_rows, size=min(sample_size, len(live_rows)), replace=False))
+            centroids = _spherical_kmeans(matrix[sample].astype(np.float32), nlist, iterations, rng)
+
+            assignments = np.empty(len(live_rows), dtype=np.int32)
+            for start in range(0, len(live_rows), _BLOCK_ROWS):
+                block = matrix[live_rows[start:start + _BLOCK_ROWS]].astype(np.float32)
+                assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+            order = np.argsort(assignments, kind="stable")
+            offsets = np.zeros(nlist + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assignments, minlength=nlist), out=offsets[1:])
+
+            temporary = self.ivf_path + ".tmp.npz"
+            np.savez(temporary, centroids=centroids, offsets=offsets, rows=live_rows[order],
+                     trained_rows=np.int64(trained_rows))
+            os.replace(temporary, self.ivf_path)
+
+    # -- reading --
+
+    def row_count(self) -> int:
+        try:
+            return os.path.getsize(self.vectors_path) // self.row_bytes
+        except FileNotFoundError:
+            return 0
+
+    def _open_matrix(self):
+        rows = self.row_count()
+        if rows != self._matrix_rows:
+            self._matrix = (np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim))
+                            if rows else np.zeros((0, self.dim), dtype=np.float16))
+            self._matrix_rows = rows
+        return self._matrix
+
+    def _load_ivf(self):
+        mtime = os.path.getmtime(self.ivf_path)
+        if mtime != self._ivf_mtime:
+            with np.load(self.ivf_path) as ivf:
+                self._ivf = {key: ivf[key] for key in ivf.files}
+            self._ivf["trained_rows"] = int(self._ivf["trained_rows"])
+            self._ivf_mtime = mtime
+        return self._ivf
+
+    def search(self, query: np.ndarray, limit: int = 10, nprobe: int = VECTOR_NPROBE) -> list:
+        """
+        Return up to `limit` (row, score) pairs with the highest cosine similarity to the
+        normalized `query`, best first. Rows that are no longer live may be included.
+        """
+        matrix = self._open_matrix()
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        if not len(matrix):
+            return []
+
+        if os.path.exists(self.ivf_path):
+            ivf = self._load_ivf()
+            probes = np.argsort(ivf["centroids"] @ query)[::-1][:nprobe]
+            candidates = np.concatenate([ivf["rows"][ivf["offsets"][p]:ivf["offsets"][p + 1]] for p in probes]
+                                        + [np.arange(ivf["trained_rows"], len(matrix), dtype=np.int64)])
+            candidates.sort()  # sequential reads from the memory map
+        else:
+            candidates = None
+
+        best_rows, best_scores = [], []
+        total = len(matrix) if candidates is None else len(candidates)
+        for start in range(0, total, _BLOCK_ROWS):
+            rows = (np.arange(start, min(start + _BLOCK_ROWS, total)) if candidates is None
+                    else candidates[start:start + _BLOCK_ROWS])
+            block = matrix[start:start + len(rows)] if candidates is None else matrix[rows]
+            scores = block.astype(np.float32) @ query
+            top = np.argpartition(scores, -min(limit, len(scores)))[-limit:]
+            best_rows.append(rows[top])
+            best_scores.append(scores[top])
+
+        rows, scores = np.concatenate(best_rows), np.concatenate(best_scores)
+        order = np.argsort(scores)[::-1][:limit]
+        return [(int(rows[i]), float(scores[i])) for i in order]
+
+def _spherical_kmeans(points: np.ndarray, k: int, iterations: int, rng) -> np.ndarray:
+    """k-means on the unit sphere (cosine similarity); returns normalized centroids."""
+    k = min(k, len(points))
+    centroids = points[rng.choice(len(points), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(points @ centroids.T, axis=1)
+        counts = np.bincount(assignments, minlength=k)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.zeros_like(centroids)
+        empty = counts == 0
+        sums[~empty] = np.add.reduceat(points[np.argsort(assignments, kind="stable")], starts[~empty], axis=0)
+        sums[empty] = points[rng.choice(len(points), size=int(empty.sum()))]  # re-seed empty lists
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids.astype(np.float32)
+
+_index = None
+
+def get_vector_index() -> VectorIndex:
+    """The vector index for the configured embedding model, one per process."""
+    global _index
+    if _index is None:
+        _index = VectorIndex(VECTOR_INDEX_DIR, embedding_name(), embedding_dim())
+    return _index
@@ -0,0 +1,138 @@
+"""
+Watches the client data tree and keeps `documents` and the folder counts in sync with it.
+
+File events (inotify through watchdog) are debounced and coalesced into a list of folders
+and sent as one sync_folders_task, which only touches the rows of those folders. Where
+inotify is not available (watchdog missing, network filesystems, watch limit reached) the
+tree is polled with stat-only scandir snapshots instead. Either way the whole tree is
+reconciled at startup and every WATCH_RECONCILE_SECONDS, to catch events that were missed.
+
+    python -m app.watcher
+"""
+import os
+import threading
+import time
+from app.scanner import CLIENT_DATA_ROOT, scan_docx_files
+
+WATCH_ROOT = os.getenv("WATCH_ROOT", CLIENT_DATA_ROOT)
+WATCH_MODE = os.getenv("WATCH_MODE", "auto")  # auto, inotify or poll
+# A batch is sent once no event came in for WATCH_DEBOUNCE_SECONDS, or when its oldest
+# event is WATCH_MAX_DELAY_SECONDS old, so a steady stream of copies still gets synced
+WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", "2"))
+WATCH_MAX_DELAY_SECONDS = float(os.getenv("WATCH_MAX_DELAY_SECONDS", "30"))
+WATCH_POLL_SECONDS = float(os.getenv("WATCH_POLL_SECONDS", "60"))
+WATCH_RECONCILE_SECONDS = float(os.getenv("WATCH_RECONCILE_SECONDS", "3600"))
+TICK_SECONDS = 0.5
+
+class ChangeBatcher:
+    """
+    Folders with changes since the last batch, as {path: recursive}. Folders below a folder
+    that is synced recursively are left out, and a folder is synced recursively when any of
+    its events asks for it.
+    """
+    def __init__(self, debounce: float = WATCH_DEBOUNCE_SECONDS, max_delay: float = WATCH_MAX_DELAY_SECONDS):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._folders = {}
+        self._first = self._last = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, folder: str, recursive: bool = False):
+        now = time.monotonic()
+        with self._lock:
+            if not self._folders:
+                self._first = now
+            self._last = now
+            self._folders[folder] = self._folders.get(folder, False) or recursive
+
+    def take(self) -> list:
+        """The coalesced (folder, recursive) pairs when the batch is due, else an empty list."""
+        now = time.monotonic()
+        with self._lock:
+            if not self._folders or not (now - self._last >= self.debounce or now - self._first >= self.max_delay):
+                return []
+            folders, self._folders = self._folders, {}
+
+        recursive = [folder for folder, deep in folders.items() if deep]
+        return sorted((folder, deep) for folder, deep in folders.items()
+                      if not any(folder.startswith(parent + os.sep) for parent in recursive))
+
+def start_inotify(root: str, batcher: ChangeBatcher):
+    """Start a watchdog observer that feeds `batcher`; raises ImportError or OSError when unavailable."""
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.event_type in ("opened", "closed_no_write"):
+                return
+            paths = [event.src_path, getattr(event, "dest_path", "")]
+            for path in filter(None, map(os.fsdecode, paths)):
+                if event.is_directory:
+                    if event.event_type in ("created", "deleted", "moved"):
+                        batcher.add(path, recursive=True)
+                elif path.endswith(".docx"):
+                    batcher.add(os.path.dirname(path))
+
+    observer = Observer()
+    observer.schedule(Handler(), root, recursive=True)
+    observer.start()
+    return observer
+
+def snapshot(root: str) -> dict:
+    """Stat fingerprint of every .docx file below `root`, keyed by path."""
+    return {f.path: (f.size, f.mtime_ns, f.inode) for f in scan_docx_files(root)}
+
+def poll_changes(root: str, previous: dict, batcher: ChangeBatcher) -> dict:
+    """
+    Add the folders whose files differ from the `previous` snapshot to `batcher`; returns
+    the new snapshot. Folders without files before are added recursively, like a directory
+    created under inotify.
+    """
+    current = snapshot(root)
+    known_folders = {os.path.dirname(path) for path in previous}
+    for path in current.keys() | previous.keys():
+        if current.get(path) != previous.get(path):
+            folder = os.path.dirname(path)
+            batcher.add(folder, recursive=folder not in known_folders)
+    return current
+
+def send(folders: list, recount: bool = False):
+    from app.tasks import sync_folders_task
+    sync_folders_task.delay([list(pair) for pair in folders], recount)
+
+def watch(root: str = WATCH_ROOT, mode: str = WATCH_MODE):
+    root = os.path.normpath(root)
+    batcher = ChangeBatcher()
+    observer = None
+    if mode != "poll":
+        try:
+            observer = start_inotify(root, batcher)
+            print(f"Watching {root} with inotify")
+        except (ImportError, OSError) as e:
+            if mode == "inotify":
+                raise
+            print(f"Could not start inotify, polling {root} every {WATCH_POLL_SECONDS:.0f}s instead: {e}")
+    previous = snapshot(root) if observer is None else None
+
+    send([(root, True)], recount=True)
+    reconciled = polled = time.monotonic()
+    try:
+        while True:
+            time.sleep(TICK_SECONDS)
+            now = time.monotonic()
+            if previous is not None and now - polled >= WATCH_POLL_SECONDS:
+                previous, polled = poll_changes(root, previous, batcher), now
+            folders = batcher.take()
+            if folders:
+                send(folders)
+            if now - reconciled >= WATCH_RECONCILE_SECONDS:
+                send([(root, True)], recount=True)
+                reconciled = now
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+if __name__ == "__main__":
+    watch()
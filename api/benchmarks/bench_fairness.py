@@ -0,0 +1,201 @@
+"""
+Fairness and tail latency of the child job scheduling (app.scheduling) against plain FIFO.
+
+A simulated cluster of --workers workers runs child jobs of --child-ms each. Workers take
+from the interactive lane before the bulk queue, like workers started with
+`--queues llm-interactive,llm`. The workload:
+
+- one big fan-out of --big-children children from Company A at the start;
+- every --small-interval seconds a fan-out of --small-children children from one of
+  --small-tenants other clients;
+- every --interactive-interval seconds an interactive request of one child.
+
+In fifo mode every child goes to the bulk queue in submission order, as before tenant
+scheduling. In fair mode interactive requests take the interactive lane, and fan-outs
+go through the real tenant queues and Dispatcher in Redis (REDIS_URL), with
+--max-in-flight children dispatched at a time. Use a development Redis: the scheduler
+keys are cleared before and after each run.
+
+Per class of job it reports p50/p95/p99 latency (submission to last child finished) and
+slowdown (latency over the job's run time on an idle cluster), the big job's makespan and
+Jain's fairness index over the mean slowdown per tenant (1.0: every tenant is slowed down
+equally).
+
+    python -m benchmarks.bench_fairness --json fairness.json
+"""
+import argparse
+import json
+import math
+import queue
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+
+MODES = ("fifo", "fair")
+
+class Job:
+    def __init__(self, job_id: int, tenant: str, kind: str, children: int, submitted: float):
+        self.job_id = job_id
+        self.tenant = tenant
+        self.kind = kind
+        self.remaining = children
+        self.children = children
+        self.submitted = submitted
+        self.finished = None
+
+def percentile(values: list, q: float):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, math.ceil(q * len(values)) - 1)]
+
+def jain_index(values: list) -> float:
+    return sum(values) ** 2 / (len(values) * sum(v * v for v in values)) if values else None
+
+def clear_scheduler_keys():
+    from app.cache import get_redis
+    from app.scheduling import PREFIX
+    client = get_redis()
+    keys = list(client.scan_iter(f"{PREFIX}:*"))
+    if keys:
+        client.delete(*keys)
+
+def run(mode: str, args) -> dict:
+    """Run the workload once in `mode`; returns the finished jobs."""
+    interactive, bulk = queue.Queue(), queue.Queue()
+    jobs, lock = {}, threading.Lock()
+    child_ids = iter(range(1, 1 << 62))
+    stop = threading.Event()
+    rng = random.Random(args.seed)
+    child_seconds = args.child_ms / 1000
+
+    if mode == "fair":
+        from app.scheduling import Dispatcher, enqueue, finish_child, track_fan_out
+        clear_scheduler_keys()
+        dispatcher = Dispatcher(bulk.put, max_in_flight=args.max_in_flight)
+
+    def worker():
+        while not stop.is_set():
+            try:
+                item = interactive.get_nowait()
+            except queue.Empty:
+                try:
+                    item = bulk.get(timeout=0.005)
+                except queue.Empty:
+                    continue
+            job_id, child_id = item["job_id"], item["child_id"]
+            time.sleep(child_seconds * rng.uniform(0.5, 1.5))
+            if mode == "fair" and jobs[job_id].kind != "interactive":
+                finish_child(job_id, child_id)
+            with lock:
+                job = jobs[job_id]
+                job.remaining -= 1
+                if job.remaining == 0:
+                    job.finished = time.perf_counter()
+
+    def dispatch():
+        while not stop.is_set():
+            if not dispatcher.dispatch():
+                time.sleep(args.tick_ms / 1000)
+
+    def submit(tenant: str, kind: str, children: int):
+        job_id = len(jobs) + 1
+        with lock:
+            jobs[job_id] = Job(job_id, tenant, kind, children, time.perf_counter())
+        items = [{"job_id": job_id, "child_id": next(child_ids)} for _ in range(children)]
+        if mode == "fifo":
+            for item in items:
+                bulk.put(item)
+        elif kind == "interactive":
+            for item in items:
+                interactive.put(item)
+        else:
+            track_fan_out(job_id, children)
+            enqueue(tenant, [(item["child_id"], item) for item in items])
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.workers)]
+    if mode == "fair":
+        threads.append(threading.Thread(target=dispatch, daemon=True))
+    for thread in threads:
+        thread.start()
+
+    started = time.perf_counter()
+    submit("Company A", "big", args.big_children)
+    next_small = next_interactive = started
+    small_tenants = [f"Company {chr(ord('B') + i)}" for i in range(args.small_tenants)]
+    while time.perf_counter() - started < args.duration:
+        now = time.perf_counter()
+        if now >= next_small:
+            submit(rng.choice(small_tenants), "small", args.small_children)
+            next_small += args.small_interval
+        if now >= next_interactive:
+            submit(rng.choice(small_tenants), "interactive", 1)
+            next_interactive += args.interactive_interval
+        time.sleep(0.001)
+    while any(job.finished is None for job in list(jobs.values())):
+        time.sleep(0.01)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if mode == "fair":
+        clear_scheduler_keys()
+    return jobs
+
+def summarize(jobs: dict, args) -> dict:
+    def ideal(job):  # run time on an otherwise idle cluster
+        return math.ceil(job.children / args.workers) * args.child_ms / 1000
+
+    result = {"classes": {}}
+    for kind in ("interactive", "small", "big"):
+        latencies = [job.finished - job.submitted for job in jobs.values() if job.kind == kind]
+        slowdowns = [(job.finished - job.submitted) / ideal(job) for job in jobs.values() if job.kind == kind]
+        result["classes"][kind] = {
+            "jobs": len(latencies),
+            **{f"p{q}_ms": round(percentile(latencies, q / 100) * 1000, 1) if latencies else None for q in (50, 95, 99)},
+            "mean_slowdown": round(statistics.fmean(slowdowns), 2) if slowdowns else None,
+        }
+    result["big_makespan_s"] = round(result["classes"]["big"]["p99_ms"] / 1000, 2)
+
+    per_tenant = defaultdict(list)
+    for job in jobs.values():
+        if job.kind != "interactive":
+            per_tenant[job.tenant].append((job.finished - job.submitted) / ideal(job))
+    result["tenant_slowdown"] = {tenant: round(statistics.fmean(s), 2) for tenant, s in sorted(per_tenant.items())}
+    result["jain_index"] = round(jain_index(list(result["tenant_slowdown"].values())), 3)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--child-ms", type=float, default=20)
+    parser.add_argument("--big-children", type=int, default=2000)
+    parser.add_argument("--small-children", type=int, default=20)
+    parser.add_argument("--small-tenants", type=int, default=3)
+    parser.add_argument("--small-interval", type=float, default=0.25)
+    parser.add_argument("--interactive-interval", type=float, default=0.2)
+    parser.add_argument("--duration", type=float, default=4, help="seconds during which small jobs are submitted")
+    parser.add_argument("--max-in-flight", type=int, default=16)
+    parser.add_argument("--tick-ms", type=float, default=5, help="dispatcher sleep when nothing could be sent")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = {"settings": {k: v for k, v in vars(args).items() if k != "json"}, "modes": {}}
+    print(f"{'mode':<5} {'class':<12} | {'jobs':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} | {'slowdown':>8}")
+    for mode in args.modes:
+        result = results["modes"][mode] = summarize(run(mode, args), args)
+        for kind, stats in result["classes"].items():
+            print(f"{mode:<5} {kind:<12} | {stats['jobs']:>5} {stats['p50_ms'] or 0:>8.1f} {stats['p95_ms'] or 0:>8.1f} "
+                  f"{stats['p99_ms'] or 0:>8.1f} | {stats['mean_slowdown'] or 0:>8.2f}")
+        print(f"{mode:<5} big job makespan {result['big_makespan_s']}s, Jain's fairness index {result['jain_index']}, "
+              f"slowdown per tenant {result['tenant_slowdown']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Measure LLM throughput of a single process through the shared async client and rate limiter.
+
+Start the mock server first (see benchmarks/mock_openai.py), then from the api directory:
+
+    python -m benchmarks.bench_llm_concurrency --requests 500
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("OPENAI_BASE_URL", "http://127.0.0.1:8001/v1")
+os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+from app.llm import _summary_request, acomplete, get_rate_limiter, run_async  # noqa: E402
+
+async def _timed(request: dict) -> float:
+    started = time.perf_counter()
+    await acomplete(request)
+    return time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    requests = [_summary_request(f"Document {i}: " + "tekst " * 200) for i in range(args.requests)]
+
+    async def run():
+        return await asyncio.gather(*(_timed(request) for request in requests))
+
+    started = time.perf_counter()
+    latencies = sorted(run_async(run()))
+    elapsed = time.perf_counter() - started
+
+    async def limiter_stats():
+        limiter = get_rate_limiter()
+        return limiter.rate_limited, limiter.rpm
+
+    rate_limited, rpm = run_async(limiter_stats())
+    print(f"{args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.1f} req/s)")
+    print(f"latency p50 {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f} ms")
+    print(f"429 responses {rate_limited}, current limiter rate {rpm:.0f} rpm")
+
+if __name__ == "__main__":
+    main()
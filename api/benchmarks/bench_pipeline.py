@@ -0,0 +1,248 @@
+"""
+End-to-end benchmark of the document pipeline on a synthetic tree (see generate_tree):
+count -> metadata -> fingerprint -> tag -> summarize, optionally analyze and embed.
+
+The real folder tasks run against the configured Postgres (DB_URL) and Redis (REDIS_URL),
+with OpenAI replaced by benchmarks.mock_openai served in-process. Celery is not needed:
+child jobs run on a thread pool that stands in for the extract and llm workers. Earlier
+results for the tree are removed first, so every run starts cold.
+
+The LLM stages are bound by the client's rate limiter like in production: raise
+LLM_RPM_LIMIT and LLM_TPM_LIMIT to measure the pipeline rather than the quota.
+
+Per stage it reports documents per second, p50/p99 latency per child job, SQL statements
+(also per document), mock LLM requests and the process's peak memory. Save a run with
+--json and pass it as --baseline later to fail (exit 1) on regressions.
+
+    python -m benchmarks.generate_tree /tmp/bench-tree --files 10000
+    python -m benchmarks.bench_pipeline /tmp/bench-tree --llm-latency-ms 200 --json baseline.json
+    python -m benchmarks.bench_pipeline /tmp/bench-tree --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import numpy as np
+
+STAGES = ["count", "metadata", "fingerprint", "tag", "summarize", "analyze", "embed"]
+DEFAULT_STAGES = ["count", "metadata", "fingerprint", "tag", "summarize"]
+MOCK_PORT = 8766
+
+class StageMeter:
+    """Wall time, SQL statements, child job latencies, mock LLM requests and peak memory of one stage."""
+    def __init__(self, name: str, engine, mock_stats: dict, trace_memory: bool):
+        self.name = name
+        self.engine = engine
+        self.mock_stats = mock_stats
+        self.trace_memory = trace_memory
+        self.queries = 0
+        self.documents = 0
+        self.latencies = []
+        self._lock = threading.Lock()
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.queries += 1
+
+    def child_finished(self, documents: int, seconds: float):
+        with self._lock:
+            self.documents += documents
+            self.latencies.append(seconds)
+
+    def __enter__(self):
+        from sqlalchemy import event
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        if self.trace_memory:
+            tracemalloc.start()
+        self._llm_requests = self.mock_stats["requests"]
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        self.seconds = time.perf_counter() - self._started
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+        self.llm_requests = self.mock_stats["requests"] - self._llm_requests
+        self.traced_peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20 if self.trace_memory else None
+        if self.trace_memory:
+            tracemalloc.stop()
+        self.rss_peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def result(self) -> dict:
+        p50, p99 = (np.percentile(self.latencies, [50, 99]) * 1000).tolist() if self.latencies else (None, None)
+        return {
+            "documents": self.documents,
+            "seconds": round(self.seconds, 3),
+            "documents_per_second": round(self.documents / self.seconds, 1) if self.seconds else None,
+            "child_jobs": len(self.latencies),
+            "p50_ms": round(p50, 1) if p50 is not None else None,
+            "p99_ms": round(p99, 1) if p99 is not None else None,
+            "queries": self.queries,
+            "queries_per_document": round(self.queries / self.documents, 2) if self.documents else None,
+            "llm_requests": self.llm_requests,
+            "rss_peak_mb": round(self.rss_peak_mb, 1),
+            "traced_peak_mb": round(self.traced_peak_mb, 1) if self.traced_peak_mb is not None else None,
+        }
+
+def threaded_fan_out(tasks, meter_of, extract_concurrency: int, llm_concurrency: int):
+    """
+    Replacement for tasks._fan_out that runs the child jobs in-process: the extract step of
+    every child on `extract_concurrency` threads first, then the tasks themselves on
+    `llm_concurrency` threads (LLM stages) or `extract_concurrency` threads (CPU stages).
+    """
+    from app.db import create_child_jobs, update_job, rollup_job
+    from app.pipeline import TASK_STAGES
+
+    def fan_out(job_id, path, task, argument_lists, label, extract_paths=None, interactive=False):
+        if not argument_lists:
+            update_job(job_id, status="done", result=f"No documents left for {label}")
+            return f"No documents left for {label}"
+        meter = meter_of()
+        child_ids = create_child_jobs(job_id, len(argument_lists))
+        update_job(job_id, status="running", result=f"Started {len(child_ids)} {label} jobs")
+
+        def run(step, child_id, arguments):
+            started = time.perf_counter()
+            try:
+                step(child_id, *arguments)
+            except Exception as e:
+                print(f"{label} child job {child_id} failed: {e}")
+            documents = len(arguments[0]) if arguments and isinstance(arguments[0], list) else 1
+            return documents, time.perf_counter() - started
+
+        if extract_paths is not None:
+            with ThreadPoolExecutor(extract_concurrency) as pool:
+                list(pool.map(lambda a: run(tasks.extract_documents_task.run, *a),
+                              [(child_id, (paths,)) for child_id, paths in zip(child_ids, extract_paths)]))
+        concurrency = llm_concurrency if TASK_STAGES.get(task.name) == "llm" else extract_concurrency
+        with ThreadPoolExecutor(concurrency) as pool:
+            for documents, seconds in pool.map(lambda a: run(task.run, *a), zip(child_ids, argument_lists)):
+                meter.child_finished(documents, seconds)
+        rollup_job(job_id)
+        return f"Ran {len(child_ids)} {label} jobs"
+
+    return fan_out
+
+def reset(root: str):
+    """Remove the documents of the tree and everything cached for their content, so the run starts cold."""
+    from sqlalchemy import text
+    from app.db import engine, IN_SUBTREE, subtree_params
+    with engine.begin() as connection:
+        hashes = f"SELECT content_hash FROM documents d WHERE {IN_SUBTREE} AND content_hash IS NOT NULL"
+        connection.execute(text(f"DELETE FROM llm_cache WHERE content_hash IN ({hashes})"), subtree_params(root))
+        connection.execute(text(f"DELETE FROM document_texts WHERE content_hash IN ({hashes})"), subtree_params(root))
+        connection.execute(text(f"DELETE FROM documents d WHERE {IN_SUBTREE}"), subtree_params(root))
+        connection.execute(text("DELETE FROM folders WHERE path = :path"), {"path": root})
+
+def start_mock_server():
+    import uvicorn
+    from benchmarks import mock_openai
+    server = uvicorn.Server(uvicorn.Config(mock_openai.app, port=MOCK_PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return mock_openai.stats
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions against a baseline: lower throughput, or more queries or LLM requests per document."""
+    regressions = []
+    for stage, current in results["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            continue
+        if before["documents_per_second"] and current["documents_per_second"] is not None and \
+                current["documents_per_second"] < before["documents_per_second"] * (1 - tolerance):
+            regressions.append(f"{stage}: {current['documents_per_second']} documents/s, was {before['documents_per_second']}")
+        for key in ("queries_per_document",):
+            if before[key] is not None and current[key] is not None and current[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{stage}: {current[key]} {key.replace('_', ' ')}, was {before[key]}")
+        if before["documents"] and current["documents"] and \
+                current["llm_requests"] / current["documents"] > before["llm_requests"] / before["documents"] * (1 + tolerance):
+            regressions.append(f"{stage}: {current['llm_requests']} LLM requests, was {before['llm_requests']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root", help="tree written by benchmarks.generate_tree")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=DEFAULT_STAGES)
+    parser.add_argument("--llm-latency-ms", type=float, default=200)
+    parser.add_argument("--llm-concurrency", type=int, default=32, help="threads of the stand-in llm worker")
+    parser.add_argument("--extract-concurrency", type=int, default=1, help="threads of the stand-in extract worker")
+    parser.add_argument("--no-llm-cache", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true", help="also report tracemalloc peaks (slower)")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # The mock and the OpenAI client read their settings on import
+    os.environ["MOCK_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ.setdefault("OPENAI_BASE_URL", f"http://127.0.0.1:{MOCK_PORT}/v1")
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    os.environ["LLM_CACHE_ENABLED"] = "0" if args.no_llm_cache else "1"
+    os.environ.setdefault("PRECLASSIFIER_SHADOW_RATE", "0")
+
+    from app import tasks
+    from app.db import engine, init_db, create_job
+
+    root = os.path.abspath(args.root).rstrip(os.sep)
+    mock_stats = start_mock_server()
+    init_db()
+    reset(root)
+
+    tree_files = sum(1 for _ in tasks.scan_docx_files(root))
+    current = {}
+    tasks._fan_out = threaded_fan_out(tasks, lambda: current["meter"], args.extract_concurrency, args.llm_concurrency)
+    # Stages run one after the other here instead of being chained by the metadata sync
+    stage_tasks = {
+        "count": tasks.update_folder_count,
+        "metadata": tasks.update_folder_files_metadata,
+        "fingerprint": tasks.fingerprint_folder_task,
+        "tag": tasks.tag_folder_task,
+        "summarize": tasks.summarize_folder_task,
+        "analyze": tasks.analyze_folder_task,
+        "embed": tasks.embed_folder_task,
+    }
+    tasks.fingerprint_folder_task = tasks.embed_folder_task = SimpleNamespace(delay=lambda *a, **k: None)
+
+    from app.llm import LLM_RPM_LIMIT, LLM_TPM_LIMIT, LLM_MAX_CONCURRENCY
+    settings = {k: v for k, v in vars(args).items() if k not in ("json", "baseline")}
+    settings.update(files=tree_files, llm_rpm_limit=LLM_RPM_LIMIT, llm_tpm_limit=LLM_TPM_LIMIT,
+                    llm_max_concurrency=LLM_MAX_CONCURRENCY)
+    results = {"root": root, "settings": settings, "stages": {}}
+    print(f"{'stage':<12} | {'docs':>7} {'s':>7} {'docs/s':>8} | {'p50 ms':>7} {'p99 ms':>8} | "
+          f"{'queries':>8} {'q/doc':>6} | {'LLM req':>7} | {'RSS MB':>7}")
+    for name in [stage for stage in STAGES if stage in args.stages]:
+        with StageMeter(name, engine, mock_stats, args.trace_memory) as meter:
+            current["meter"] = meter
+            job_id = create_job(kind=name)
+            started = time.perf_counter()
+            stage_tasks[name](job_id, root)
+            if name in ("count", "metadata"):
+                # Not fanned out: the whole tree is one job
+                meter.child_finished(tree_files, time.perf_counter() - started)
+        result = results["stages"][name] = meter.result()
+        print(f"{name:<12} | {result['documents']:>7} {result['seconds']:>7.1f} {result['documents_per_second'] or 0:>8.1f} | "
+              f"{result['p50_ms'] or 0:>7.1f} {result['p99_ms'] or 0:>8.1f} | {result['queries']:>8} "
+              f"{result['queries_per_document'] or 0:>6.2f} | {result['llm_requests']:>7} | {result['rss_peak_mb']:>7.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
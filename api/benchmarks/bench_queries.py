@@ -0,0 +1,67 @@
+"""
+Compare per-file "what needs work" checks with the set-based folder queries: number of SQL
+statements and latency against folder size. Needs a reachable database (DB_URL).
+
+    python -m benchmarks.bench_queries --sizes 100 1000 10000
+"""
+import argparse
+import time
+from sqlalchemy import event, text
+from app.db import (engine, init_db, insert_documents_batch, check_document_tagged, get_document_id_by_path,
+                    get_untagged_documents_in_folder)
+from app.scanner import FileStat
+
+BENCH_ROOT = "/benchmark/queries"
+
+class QueryCounter:
+    """Count SQL statements sent through the engine while active."""
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+def seed_folder(folder: str, size: int):
+    files = [FileStat(f"{folder}/doc_{i}.docx", f"doc_{i}.docx", 10240, time.time_ns(), i) for i in range(size)]
+    for start in range(0, size, 1000):
+        insert_documents_batch(files[start:start + 1000])
+    return [f.path for f in files]
+
+def per_file(paths: list) -> list:
+    """The approach the routes used before: two queries per file."""
+    return [(get_document_id_by_path(p), p) for p in paths if not check_document_tagged(p)]
+
+def measure(fn, *args) -> tuple:
+    with QueryCounter() as counter:
+        started = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - started
+    return counter.count, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    init_db()
+    print(f"{'files':>8} | {'per-file queries':>16} {'ms':>9} | {'set-based queries':>17} {'ms':>7}")
+    try:
+        for size in args.sizes:
+            folder = f"{BENCH_ROOT}/{size}"
+            paths = seed_folder(folder, size)
+            old_queries, old_elapsed = measure(per_file, paths)
+            new_queries, new_elapsed = measure(get_untagged_documents_in_folder, folder)
+            print(f"{size:>8} | {old_queries:>16} {old_elapsed * 1000:>9.1f} | {new_queries:>17} {new_elapsed * 1000:>7.1f}")
+    finally:
+        with engine.begin() as connection:
+            connection.execute(text("DELETE FROM documents WHERE path LIKE :pattern"), {"pattern": f"{BENCH_ROOT}/%"})
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Latency and recall of the IVF vector index against a brute-force scan on synthetic clustered
+vectors. No database is needed; the index is written to a temporary directory.
+
+    python -m benchmarks.bench_vector_search --rows 1000000 --queries 200
+"""
+import argparse
+import statistics
+import tempfile
+import time
+import numpy as np
+from app.vector_index import VectorIndex
+
+def generate(index: VectorIndex, rows: int, clusters: int, rng, block: int = 100_000):
+    """Append `rows` unit vectors scattered around `clusters` random topics."""
+    centers = rng.standard_normal((clusters, index.dim)).astype(np.float32)
+    for start in range(0, rows, block):
+        n = min(block, rows - start)
+        vectors = centers[rng.integers(0, clusters, n)] + 0.8 * rng.standard_normal((n, index.dim)).astype(np.float32)
+        index.append(vectors / np.linalg.norm(vectors, axis=1, keepdims=True))
+
+def brute_force(index: VectorIndex, query: np.ndarray, limit: int) -> set:
+    matrix = index._open_matrix()
+    scores = np.concatenate([matrix[s:s + 65536].astype(np.float32) @ query for s in range(0, len(matrix), 65536)])
+    return set(np.argpartition(scores, -limit)[-limit:].tolist())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--recall-queries", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        index = VectorIndex(directory, "bench", args.dim)
+        started = time.perf_counter()
+        generate(index, args.rows, args.clusters, rng)
+        print(f"Wrote {args.rows} vectors in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        index.train(np.arange(args.rows))
+        print(f"Trained IVF in {time.perf_counter() - started:.1f}s")
+
+        matrix = index._open_matrix()
+        queries = matrix[rng.integers(0, args.rows, args.queries)].astype(np.float32)
+        queries += 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(args.dim)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        exact = [brute_force(index, q, args.limit) for q in queries[:args.recall_queries]]
+
+        print(f"{'nprobe':>6} | {'p50 ms':>7} {'p99 ms':>7} | {'recall@' + str(args.limit):>9}")
+        for nprobe in args.nprobe:
+            latencies = []
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, args.limit, nprobe)
+                latencies.append(time.perf_counter() - started)
+            recall = statistics.mean(len(exact_rows & {row for row, _ in index.search(q, args.limit, nprobe)}) / args.limit
+                                     for q, exact_rows in zip(queries, exact))
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            print(f"{nprobe:>6} | {p50:>7.1f} {p99:>7.1f} | {recall:>9.3f}")
+
+if __name__ == "__main__":
+    main()
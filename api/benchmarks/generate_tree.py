@@ -0,0 +1,169 @@
+"""
+Generate a synthetic client tree of .docx files: companies with projects, subfolders and
+documents of varied kinds (meeting notes, policies, financial reports, ...) with headings,
+lists and tables of varying size. A share of the documents are exact copies or lightly
+edited near-duplicates of others, as in real client folders.
+
+Documents are written straight into a template package made by python-docx once, at
+about 500 files per second, so even a million files take about half an hour.
+
+    python -m benchmarks.generate_tree /tmp/bench-tree --files 10000
+"""
+import argparse
+import io
+import os
+import random
+import shutil
+import time
+import zipfile
+from xml.sax.saxutils import escape
+from docx import Document
+
+# (title, tag-like keywords, heading names) per kind of document
+DOCUMENT_KINDS = [
+    ("Notulen", "vergadering aanwezig agenda besluit actiepunt rondvraag",
+     ["Opening", "Vaststelling agenda", "Mededelingen", "Besluiten", "Actiepunten", "Rondvraag"]),
+    ("Beleid", "beleid richtlijn procedure gedragscode regeling",
+     ["Doel", "Reikwijdte", "Uitgangspunten", "Procedure", "Verantwoordelijkheden"]),
+    ("Jaarrekening", "omzet winst balans kosten kasstroom boekjaar begroting",
+     ["Balans", "Winst- en verliesrekening", "Kasstroomoverzicht", "Toelichting"]),
+    ("Projectplan", "project mijlpaal planning scope opdracht deliverable",
+     ["Aanleiding", "Scope", "Planning", "Mijlpalen", "Risico's", "Budget"]),
+    ("Risicoanalyse", "risico maatregel beheersing kans impact mitigatie",
+     ["Inleiding", "Risico-overzicht", "Maatregelen", "Restrisico"]),
+    ("Functioneringsgesprek", "medewerker beoordeling doelen ontwikkeling functioneren",
+     ["Terugblik", "Doelen", "Ontwikkeling", "Afspraken"]),
+    ("Technisch ontwerp", "systeem architectuur specificatie configuratie installatie",
+     ["Architectuur", "Componenten", "Configuratie", "Installatie", "Beheer"]),
+    ("Contract", "partij overeenkomst verplichting betaling termijn opzegging",
+     ["Partijen", "Definities", "Verplichtingen", "Betaling", "Duur en opzegging"]),
+]
+FILLER = ("de het een van en in op voor met door aan bij als dat deze wordt worden zijn is "
+          "heeft hebben kan moet zal ook niet nog wel meer over onder tussen na volgens").split()
+SUBFOLDERS = ["", "Archief", "Financieel", "HR", "Juridisch", "Vergaderingen", "Techniek"]
+
+class DocxWriter:
+    """Writes .docx files from paragraphs and tables into the package of an empty python-docx document."""
+    def __init__(self):
+        buffer = io.BytesIO()
+        Document().save(buffer)
+        with zipfile.ZipFile(buffer) as template:
+            self.parts = {name: template.read(name) for name in template.namelist()}
+        document = self.parts["word/document.xml"].decode("utf-8")
+        self.head = document[:document.index("<w:body>") + len("<w:body>")]
+        self.tail = document[document.index("<w:sectPr"):]
+
+    @staticmethod
+    def paragraph(text: str, style: str = None) -> str:
+        properties = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+        return f'<w:p>{properties}<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+    @classmethod
+    def table(cls, rows: list) -> str:
+        cells = "".join("<w:tr>" + "".join(f"<w:tc>{cls.paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>"
+                        for row in rows)
+        return f'<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/></w:tblPr>{cells}</w:tbl>'
+
+    def write(self, path: str, body: list):
+        # Only the document is compressed; the template parts are stored as is, which saves
+        # most of the time per file
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as package:
+            for name, data in self.parts.items():
+                if name == "word/document.xml":
+                    package.writestr(name, self.head + "".join(body) + self.tail,
+                                     compress_type=zipfile.ZIP_DEFLATED, compresslevel=1)
+                else:
+                    package.writestr(name, data)
+
+def random_sentence(rng: random.Random, keywords: list, words: int) -> str:
+    sentence = rng.choices(FILLER, k=words)
+    for i in range(0, words, 5):
+        sentence[i] = rng.choice(keywords)
+    return " ".join(sentence).capitalize() + "."
+
+def document_body(rng: random.Random, company: str, project: str) -> list:
+    """Headings, paragraphs, a list and up to a few tables for a random kind of document."""
+    title, keywords, headings = rng.choice(DOCUMENT_KINDS)
+    keywords = keywords.split()
+    body = [DocxWriter.paragraph(f"{title} {project} – {company}", "Title")]
+    for heading in rng.sample(headings, rng.randint(2, len(headings))):
+        body.append(DocxWriter.paragraph(heading, "Heading1"))
+        for _ in range(rng.randint(1, 4)):
+            body.append(DocxWriter.paragraph(" ".join(random_sentence(rng, keywords, rng.randint(8, 25))
+                                                      for _ in range(rng.randint(1, 5)))))
+        if rng.random() < 0.3:
+            body.extend(DocxWriter.paragraph(random_sentence(rng, keywords, 6), "ListBullet")
+                        for _ in range(rng.randint(2, 5)))
+        if rng.random() < 0.35:
+            columns = rng.randint(2, 6)
+            rows = [[rng.choice(keywords).capitalize() for _ in range(columns)]]
+            rows += [[f"{rng.randint(0, 99999):,}".replace(",", ".") if c else rng.choice(FILLER)
+                      for c in range(columns)] for _ in range(rng.randint(1, 40))]
+            body.append(DocxWriter.table(rows))
+    return body
+
+def near_duplicate(rng: random.Random, body: list) -> list:
+    """A copy with one paragraph changed, as when a document is saved again after a small edit."""
+    body = list(body)
+    index = rng.randrange(1, len(body)) if len(body) > 1 else 0
+    body[index] = DocxWriter.paragraph("Gewijzigd na overleg: " + random_sentence(rng, FILLER, 10))
+    return body
+
+def generate_tree(root: str, files: int, companies: int = None, seed: int = 0,
+                  duplicate_rate: float = 0.03, near_duplicate_rate: float = 0.03) -> dict:
+    """Write `files` documents below `root`; returns counts of the written documents."""
+    rng = random.Random(seed)
+    writer = DocxWriter()
+    companies = companies or max(1, files // 2000)
+    folders = []
+    for c in range(companies):
+        company = f"Bedrijf {c + 1:04d}"
+        for p in range(rng.randint(3, 12)):
+            project = f"Project {p + 1:02d}"
+            for subfolder in rng.sample(SUBFOLDERS, rng.randint(1, 4)):
+                folders.append((company, project, os.path.join(root, company, project, subfolder)))
+    for _, _, folder in folders:
+        os.makedirs(folder, exist_ok=True)
+
+    counts = {"documents": 0, "exact_duplicates": 0, "near_duplicates": 0}
+    written = []  # (path, body) of a sample of earlier documents to copy from
+    for i in range(files):
+        company, project, folder = rng.choice(folders)
+        path = os.path.join(folder, f"document_{i:07d}.docx")
+        roll = rng.random()
+        if written and roll < duplicate_rate:
+            shutil.copyfile(rng.choice(written)[0], path)
+            counts["exact_duplicates"] += 1
+        elif written and roll < duplicate_rate + near_duplicate_rate:
+            writer.write(path, near_duplicate(rng, rng.choice(written)[1]))
+            counts["near_duplicates"] += 1
+        else:
+            body = document_body(rng, company, project)
+            writer.write(path, body)
+            if len(written) < 1000:
+                written.append((path, body))
+            elif rng.random() < 0.01:
+                written[rng.randrange(len(written))] = (path, body)
+        counts["documents"] += 1
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--companies", type=int, default=None, help="default: one per 2000 files")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duplicate-rate", type=float, default=0.03)
+    parser.add_argument("--near-duplicate-rate", type=float, default=0.03)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate_tree(args.root, args.files, args.companies, args.seed,
+                           args.duplicate_rate, args.near_duplicate_rate)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {counts['documents']} documents ({counts['exact_duplicates']} exact and "
+          f"{counts['near_duplicates']} near duplicates) to {args.root} in {elapsed:.1f}s "
+          f"({counts['documents'] / elapsed:.0f} files/s)")
+
+if __name__ == "__main__":
+    main()
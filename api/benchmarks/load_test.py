@@ -0,0 +1,91 @@
+"""
+Latency under concurrency for a route that queries Postgres from the event loop with the sync
+engine (app.db) versus the async engine (app.db_async). Runs a small app on uvicorn with both
+variants and a slow route (pg_sleep) mixed in, as a stand-in for one expensive query, then
+reports p50/p95/p99 of the fast requests. Needs a reachable database (DB_URL).
+
+    python -m benchmarks.load_test --requests 2000 --concurrency 50 --slow-every 20
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+import httpx
+import uvicorn
+from fastapi import FastAPI
+from sqlalchemy import text
+from app import db, db_async
+
+FOLDER = "/benchmark/load"
+PORT = 8765
+
+app = FastAPI()
+
+@app.get("/sync/metadata")
+async def sync_metadata():
+    return len(db.get_documents_metadata_in_folder(FOLDER, 10))
+
+@app.get("/async/metadata")
+async def async_metadata():
+    return len(await db_async.get_documents_metadata_in_folder(FOLDER, 10))
+
+@app.get("/sync/slow")
+async def sync_slow(seconds: float):
+    with db.engine.begin() as connection:
+        connection.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": seconds})
+
+@app.get("/async/slow")
+async def async_slow(seconds: float):
+    async with db_async.async_engine.connect() as connection:
+        await connection.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": seconds})
+
+def start_server() -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def run(variant: str, total: int, concurrency: int, slow_every: int, slow_seconds: float) -> list:
+    """Send `total` requests with `concurrency` in flight; return the latencies of the fast ones."""
+    latencies = []
+    counter = iter(range(total))
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=60) as client:
+        async def worker():
+            for i in counter:
+                if slow_every and i % slow_every == 0:
+                    await client.get(f"/{variant}/slow", params={"seconds": slow_seconds})
+                    continue
+                started = time.perf_counter()
+                response = await client.get(f"/{variant}/metadata")
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies
+
+def percentile(values: list, q: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1] if len(values) > 1 else values[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--slow-every", type=int, default=20, help="every Nth request is the slow query, 0 for none")
+    parser.add_argument("--slow-seconds", type=float, default=0.2)
+    args = parser.parse_args()
+
+    start_server()
+    print(f"{'variant':>8} | {'req/s':>7} | {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for variant in ("sync", "async"):
+        asyncio.run(run(variant, args.concurrency * 2, args.concurrency, 0, 0))  # warm up the pools
+        started = time.perf_counter()
+        latencies = asyncio.run(run(variant, args.requests, args.concurrency, args.slow_every, args.slow_seconds))
+        elapsed = time.perf_counter() - started
+        print(f"{variant:>8} | {args.requests / elapsed:>7.0f} | {percentile(latencies, 50) * 1000:>8.1f} "
+              f"{percentile(latencies, 95) * 1000:>8.1f} {percentile(latencies, 99) * 1000:>8.1f}")
+
+if __name__ == "__main__":
+    main()
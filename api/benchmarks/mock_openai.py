@@ -0,0 +1,84 @@
+"""
+Minimal local stand-in for the OpenAI chat completions API, for load tests and benchmarks.
+
+    uvicorn benchmarks.mock_openai:app --port 8001
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=mock celery -A app.tasks worker
+
+MOCK_LATENCY_MS sets the response time, MOCK_RPM_LIMIT (0 = unlimited) makes the server
+answer 429 with a retry-after header once more requests per minute arrive.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from collections import deque
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "200"))
+MOCK_RPM_LIMIT = int(os.getenv("MOCK_RPM_LIMIT", "0"))
+
+app = FastAPI(title="Mock OpenAI API")
+stats = {"requests": 0, "rate_limited": 0}
+_recent = deque()
+
+def _pick_tag(text: str, tags: list) -> list:
+    if not tags:
+        return []
+    return [tags[int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16) % len(tags)]]
+
+def _fake_content(body: dict) -> str:
+    prompt = body["messages"][-1]["content"]
+    match = re.search(r"Available Tags: (.*)", prompt)
+    tags = match.group(1).split(", ") if match else []
+    summary = "Samenvatting van het document."
+
+    if body.get("response_format", {}).get("type") == "json_object":
+        ids = re.findall(r"=== Document (\d+) ===", prompt)
+        if ids:
+            return json.dumps({"documents": [
+                {"id": int(i), "tags": _pick_tag(i + prompt, tags), "summary": summary} for i in ids
+            ]})
+        return json.dumps({"tags": _pick_tag(prompt, tags), "summary": summary})
+    if "Return the tags as a JSON array" in prompt:
+        return json.dumps(_pick_tag(prompt, tags))
+    return summary
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    if MOCK_RPM_LIMIT:
+        now = time.monotonic()
+        while _recent and now - _recent[0] > 60:
+            _recent.popleft()
+        if len(_recent) >= MOCK_RPM_LIMIT:
+            stats["rate_limited"] += 1
+            retry_after = 60 - (now - _recent[0])
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after-ms": str(int(retry_after * 1000))},
+                content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+            )
+        _recent.append(now)
+
+    await asyncio.sleep(MOCK_LATENCY_MS / 1000)
+    content = _fake_content(body)
+    prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+    completion_tokens = len(content) // 4 + 1
+    return {
+        "id": f"chatcmpl-mock-{stats['requests']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+@app.get("/stats")
+async def get_stats():
+    return stats
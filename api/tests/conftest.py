@@ -0,0 +1,16 @@
+import pytest
+from app import chunking
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    """Count tokens with the ~4 characters per token estimate, so tests need no tiktoken download."""
+    monkeypatch.setattr(chunking, "_encoding", lambda: None)
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """A fakeredis client in place of the cache Redis (app.cache.get_redis)."""
+    fakeredis = pytest.importorskip("fakeredis")
+    from app import cache
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(cache, "_client", client)
+    return client
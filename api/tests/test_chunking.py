@@ -0,0 +1,29 @@
+from app.chunking import chunk_text, count_tokens
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("# Title\n\nOne paragraph.", max_tokens=100) == ["# Title\n\nOne paragraph."]
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("", max_tokens=100) == []
+
+def test_chunks_stay_within_the_budget_and_repeat_the_heading():
+    text = "## Section\n\n" + "\n\n".join(f"Paragraph {i} " + "woord " * 30 for i in range(10))
+    chunks = chunk_text(text, max_tokens=120)
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk) <= 120 for chunk in chunks)
+    assert all(chunk.startswith("## Section") for chunk in chunks)
+    assert " ".join(chunks).count("Paragraph") == 10
+
+def test_tables_are_split_between_rows_with_their_header():
+    rows = "\n".join(f"cel {i} | " + "waarde " * 10 for i in range(20))
+    chunks = chunk_text(f"Naam | Waarde\n--- | ---\n{rows}", max_tokens=80)
+
+    assert len(chunks) > 1
+    assert all(chunk.startswith("Naam | Waarde\n--- | ---\n") for chunk in chunks)
+    assert sum(chunk.count("cel ") for chunk in chunks) == 20
+
+def test_a_single_long_word_is_cut_on_characters():
+    chunks = chunk_text("x" * 1000, max_tokens=50)
+    assert "".join(chunks) == "x" * 1000
+    assert all(count_tokens(chunk) <= 51 for chunk in chunks)
@@ -0,0 +1,30 @@
+import pytest
+from fastapi import HTTPException
+from app.routes import document_classification
+from app.routes.document_classification import resolve_folder
+
+@pytest.fixture
+def client_data(tmp_path, monkeypatch):
+    root = tmp_path / "client"
+    (root / "Company A").mkdir(parents=True)
+    (root / "Company A" / "notes.docx").write_bytes(b"x")
+    (tmp_path / "client2" / "Company A").mkdir(parents=True)
+    monkeypatch.setattr(document_classification, "BASE_PATH", str(root))
+    return root
+
+def status_of(folder_path):
+    with pytest.raises(HTTPException) as error:
+        resolve_folder(folder_path)
+    return error.value.status_code
+
+def test_resolve_folder_returns_folders_below_the_root(client_data):
+    assert resolve_folder("Company A/") == str(client_data / "Company A")
+
+def test_resolve_folder_rejects_paths_outside_the_root(client_data):
+    assert status_of("../client2/Company A") == 400  # a sibling sharing the root's prefix
+    assert status_of("../client2") == 400
+    assert status_of("Company A/../..") == 400
+
+def test_resolve_folder_reports_missing_folders_and_files(client_data):
+    assert status_of("Company B") == 404
+    assert status_of("Company A/notes.docx") == 404
@@ -0,0 +1,35 @@
+from app.fingerprint import DUPLICATE_MAX_DISTANCE, SIMHASH_BANDS, hamming_distance, simhash, simhash_bands
+
+TEXT = ("De huurder betaalt de huur maandelijks vooruit op de eerste dag van de maand. "
+        "Bij te late betaling is de huurder een boete verschuldigd van vijf procent van het bedrag. "
+        "De verhuurder zorgt voor groot onderhoud en de huurder voor klein onderhoud aan de woning. ") * 3
+
+def test_texts_too_short_have_no_simhash():
+    assert simhash("") is None
+    assert simhash("twee woorden") is None
+
+def test_simhash_is_a_signed_64_bit_integer():
+    value = simhash(TEXT)
+    assert -2 ** 63 <= value < 2 ** 63
+    assert simhash(TEXT) == value
+    assert simhash(TEXT.upper()) == value  # case insensitive
+
+def test_small_edits_are_near_duplicates_and_other_texts_are_not():
+    edited = TEXT.replace("vijf procent", "zes procent", 1)
+    other = "Notulen van de vergadering van de ondernemingsraad over het nieuwe rooster en de vakantieregeling. " * 3
+
+    assert hamming_distance(simhash(TEXT), simhash(edited)) <= DUPLICATE_MAX_DISTANCE
+    assert set(simhash_bands(simhash(TEXT))) & set(simhash_bands(simhash(edited)))  # found by the band lookup
+    assert hamming_distance(simhash(TEXT), simhash(other)) > DUPLICATE_MAX_DISTANCE
+
+def test_simhash_bands_are_tagged_with_their_position():
+    bands = simhash_bands(-1)
+    assert len(bands) == SIMHASH_BANDS == len(set(bands))
+    assert all(-2 ** 31 <= band < 2 ** 31 for band in bands)  # Postgres INT
+    assert not set(simhash_bands(0)) & set(bands)
+
+def test_hamming_distance_handles_signed_values():
+    assert hamming_distance(0, 0) == 0
+    assert hamming_distance(-1, 0) == 64
+    assert hamming_distance(-1, 1) == 63
+    assert hamming_distance(0b1011, 0b0001) == 2
@@ -0,0 +1,42 @@
+import os
+import pytest
+from app import tasks
+
+@pytest.fixture
+def database(monkeypatch):
+    """Record what update_folder_files_metadata writes instead of writing it to Postgres."""
+    calls = {"batches": [], "deleted": [], "jobs": []}
+    known = {}
+    monkeypatch.setattr(tasks, "get_document_fingerprints_in_folder", lambda path: known)
+    monkeypatch.setattr(tasks, "insert_documents_batch", lambda batch, job_id: calls["batches"].append(batch))
+    monkeypatch.setattr(tasks, "delete_documents_by_path", calls["deleted"].extend)
+    monkeypatch.setattr(tasks, "update_job", lambda job_id, **fields: calls["jobs"].append(fields))
+    monkeypatch.setattr(tasks, "invalidate_documents", lambda paths: None)
+    monkeypatch.setattr(tasks, "create_job", lambda **fields: 0)
+    monkeypatch.setattr(tasks.fingerprint_folder_task, "delay", lambda *args: None)
+    monkeypatch.setattr(tasks.embed_folder_task, "delay", lambda *args: None)
+    return calls, known
+
+def test_new_files_are_written_in_batches(tmp_path, database):
+    calls, _ = database
+    for i in range(5):
+        (tmp_path / f"{i}.docx").write_bytes(b"x")
+
+    result = tasks.update_folder_files_metadata(1, str(tmp_path), batch_size=2)
+
+    assert [len(batch) for batch in calls["batches"]] == [2, 2, 1]
+    assert result.startswith("Added 5, updated 0 and removed 0 documents")
+    assert [job["status"] for job in calls["jobs"]] == ["running", "done"]
+
+def test_an_unchanged_tree_writes_nothing(tmp_path, database):
+    calls, known = database
+    path = tmp_path / "a.docx"
+    path.write_bytes(b"x")
+    stats = os.stat(path)
+    known[str(path)] = (stats.st_size, stats.st_mtime_ns, stats.st_ino)
+    known[str(tmp_path / "gone.docx")] = (1, 1, 1)
+
+    tasks.update_folder_files_metadata(1, str(tmp_path))
+
+    assert calls["batches"] == []
+    assert calls["deleted"] == [str(tmp_path / "gone.docx")]
@@ -0,0 +1,52 @@
+import asyncio
+from app import llm
+from app.chunking import count_tokens
+from app.llm import ANALYSIS_MAX_TOKENS, pack_documents
+
+def words(n):
+    return "woord " * n
+
+def test_pack_documents_counts_prompt_and_answer_tokens():
+    documents = [(i, words(50)) for i in range(6)]
+    per_document = count_tokens(words(50)) + ANALYSIS_MAX_TOKENS
+    batches = pack_documents(documents, token_budget=per_document * 2, max_documents=10)
+
+    assert [len(batch) for batch in batches] == [2, 2, 2]
+    assert sorted(document_id for batch in batches for document_id, _ in batch) == list(range(6))
+
+def test_pack_documents_caps_the_documents_per_batch():
+    batches = pack_documents([(i, "kort") for i in range(25)], token_budget=10 ** 6, max_documents=10)
+    assert [len(batch) for batch in batches] == [10, 10, 5]
+
+def test_pack_documents_gives_a_large_document_its_own_batch():
+    batches = pack_documents([(1, words(10)), (2, words(5000)), (3, words(10))], token_budget=1000)
+    assert [[document_id for document_id, _ in batch] for batch in batches] == [[1, 3], [2]]
+
+def test_invalid_batch_answer_falls_back_to_single_requests(monkeypatch):
+    requests = []
+
+    async def acomplete(request):
+        batch = "Analyze every document separately" in request["messages"][1]["content"]
+        requests.append("batch" if batch else "single")
+        return '{"documents": [{"id": 1, "tags": ["HR"], "summ' if batch else '{"tags": ["HR"], "summary": "Kort."}'
+    monkeypatch.setattr(llm, "acomplete", acomplete)
+
+    results = asyncio.run(llm._analyze_batch([(1, "een"), (2, "twee")], ["HR"]))
+
+    assert requests == ["batch", "single", "single"]
+    assert results == {1: {"tags": ["HR"], "summary": "Kort."}, 2: {"tags": ["HR"], "summary": "Kort."}}
+
+def test_an_unparsable_single_answer_only_drops_its_document(monkeypatch):
+    async def acomplete(request):
+        if "Analyze every document separately" in request["messages"][1]["content"]:
+            return "not json"
+        return "[]" if "twee" in request["messages"][1]["content"] else '{"tags": [], "summary": "Kort."}'
+    monkeypatch.setattr(llm, "acomplete", acomplete)
+
+    results = asyncio.run(llm._analyze_batch([(1, "een"), (2, "twee"), (3, "drie")], ["HR"]))
+
+    assert results == {1: {"tags": [], "summary": "Kort."}, 3: {"tags": [], "summary": "Kort."}}
+
+def test_batch_max_tokens_stays_within_the_output_limit():
+    request = llm._analyze_batch_request([(i, "tekst") for i in range(100)], ["HR"])
+    assert request["max_tokens"] <= llm.LLM_MAX_OUTPUT_TOKENS
@@ -0,0 +1,90 @@
+import os
+from app import scanner
+from app.scanner import diff_folder, folder_and_ancestors, scan_docx_files
+
+def touch(path, content=b"x"):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+def fingerprint(path):
+    stats = os.stat(path)
+    return stats.st_size, stats.st_mtime_ns, stats.st_ino
+
+def test_scan_docx_files_lists_docx_files_only(tmp_path):
+    touch(tmp_path / "a.docx")
+    touch(tmp_path / "notes.txt")
+    touch(tmp_path / "sub" / "b.docx")
+
+    assert sorted(f.filename for f in scan_docx_files(str(tmp_path))) == ["a.docx", "b.docx"]
+    assert [f.filename for f in scan_docx_files(str(tmp_path), recursive=False)] == ["a.docx"]
+
+def test_diff_folder_reports_added_changed_and_deleted(tmp_path):
+    kept, changed, added = tmp_path / "kept.docx", tmp_path / "changed.docx", tmp_path / "added.docx"
+    for path in (kept, changed, added):
+        touch(path)
+    known = {str(kept): fingerprint(kept), str(changed): (0, 0, 0), str(tmp_path / "gone.docx"): (1, 1, 1)}
+
+    changes = diff_folder(str(tmp_path), known)
+
+    assert [f.path for f in changes.added] == [str(added)]
+    assert [f.path for f in changes.changed] == [str(changed)]
+    assert changes.deleted == [str(tmp_path / "gone.docx")]
+
+def test_diff_folder_keeps_known_files_of_unreadable_folders(tmp_path, monkeypatch):
+    touch(tmp_path / "locked" / "a.docx")
+    touch(tmp_path / "locked_sibling" / "b.docx")
+    locked, real_scandir = str(tmp_path / "locked"), os.scandir
+
+    def scandir(path):
+        if path == locked:
+            raise PermissionError(13, "Permission denied", path)
+        return real_scandir(path)
+    monkeypatch.setattr(scanner.os, "scandir", scandir)
+
+    known = {os.path.join(locked, "a.docx"): (1, 1, 1), os.path.join(locked, "deep", "c.docx"): (1, 1, 1),
+             str(tmp_path / "locked_sibling" / "gone.docx"): (1, 1, 1)}
+    failed = set()
+    assert [f.filename for f in scan_docx_files(str(tmp_path), failed=failed)] == ["b.docx"]
+    assert failed == {locked}
+    assert diff_folder(str(tmp_path), known).deleted == [str(tmp_path / "locked_sibling" / "gone.docx")]
+
+def test_diff_folder_keeps_files_that_could_not_be_stat(tmp_path, monkeypatch):
+    touch(tmp_path / "a.docx")
+    touch(tmp_path / "b.docx")
+    real_scandir = os.scandir
+
+    class Entry:
+        def __init__(self, entry):
+            self._entry, self.path, self.name = entry, entry.path, entry.name
+
+        def is_dir(self, follow_symlinks=True):
+            return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+        def is_file(self):
+            return self._entry.is_file()
+
+        def stat(self):
+            if self.name == "a.docx":
+                raise FileNotFoundError(2, "No such file or directory", self.path)
+            return self._entry.stat()
+
+    class Listing:
+        def __init__(self, path):
+            self._listing = real_scandir(path)
+
+        def __enter__(self):
+            return (Entry(entry) for entry in self._listing)
+
+        def __exit__(self, *exc):
+            self._listing.close()
+
+    monkeypatch.setattr(scanner.os, "scandir", Listing)
+    known = {str(tmp_path / "a.docx"): (1, 1, 1), str(tmp_path / "b.docx"): fingerprint(tmp_path / "b.docx")}
+
+    changes = diff_folder(str(tmp_path), known)
+
+    assert not changes
+
+def test_folder_and_ancestors():
+    assert list(folder_and_ancestors("/data/client/Company A/")) == ["/data/client/Company A", "/data/client", "/data", "/"]
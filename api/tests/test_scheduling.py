@@ -0,0 +1,71 @@
+import json
+import os
+import pytest
+from app import scheduling
+from app.scheduling import (IN_FLIGHT_KEY, Dispatcher, enqueue, finish_child, parse_weights, tenant_of,
+                            track_fan_out)
+
+def test_parse_weights():
+    assert parse_weights("") == {}
+    assert parse_weights("Company A=3, Company B=0,") == {"Company A": 3, "Company B": 1}
+
+def test_tenant_of():
+    root = os.path.join(os.sep, "data", "client")
+    assert tenant_of(os.path.join(root, "Company A", "HR", "2024"), root) == "Company A"
+    assert tenant_of(root, root) == scheduling.DEFAULT_TENANT
+    assert tenant_of(os.path.join(os.sep, "elsewhere"), root) == scheduling.DEFAULT_TENANT
+
+def run_to_completion(dispatcher, fake_redis, sent):
+    """Finish the dispatched children one at a time, dispatching after each; returns the tenants in order."""
+    order = []
+    dispatcher.dispatch()
+    while sent:
+        item = sent.pop(0)
+        order.append(item["tenant"])
+        finish_child(item["job_id"], item["child_id"])
+        dispatcher.dispatch()
+    return order
+
+def fan_out(tenant, job_id, children):
+    track_fan_out(job_id, children)
+    enqueue(tenant, [(job_id * 1000 + i, {"tenant": tenant, "job_id": job_id, "child_id": job_id * 1000 + i})
+                     for i in range(children)])
+
+def test_weights_hold_when_slots_free_up_one_at_a_time(fake_redis):
+    sent = []
+    dispatcher = Dispatcher(sent.append, max_in_flight=2, weights={"Company A": 3})
+    fan_out("Company A", 1, 12)
+    fan_out("Company B", 2, 12)
+
+    order = run_to_completion(dispatcher, fake_redis, sent)
+
+    assert "".join(tenant[-1] for tenant in order[:16]) == "AAAB" * 4
+    assert order.count("Company A") == order.count("Company B") == 12
+
+def test_in_flight_limit_and_countdown(fake_redis):
+    sent = []
+    dispatcher = Dispatcher(sent.append, max_in_flight=3, weights={})
+    fan_out("Company A", 1, 5)
+
+    assert dispatcher.dispatch() == 3
+    assert dispatcher.dispatch() == 0
+    assert fake_redis.zcard(IN_FLIGHT_KEY) == 3
+
+    remaining = [finish_child(1, item["child_id"]) for item in sent]
+    assert remaining == [4, 3, 2]
+    assert dispatcher.dispatch() == 2
+    assert [finish_child(1, item["child_id"]) for item in sent[3:]] == [1, 0]
+    assert fake_redis.keys("scheduler:remaining:*") == []
+    assert scheduling.get_tenant_backlog() == {}
+
+def test_a_failed_send_puts_the_children_back(fake_redis):
+    fan_out("Company A", 1, 3)
+
+    def send(signature):
+        raise ConnectionError("broker down")
+    with pytest.raises(ConnectionError):
+        Dispatcher(send, max_in_flight=10).dispatch()
+
+    assert fake_redis.zcard(IN_FLIGHT_KEY) == 0
+    queued = [json.loads(raw)["child_id"] for raw in fake_redis.lrange(scheduling._tenant_key("Company A"), 0, -1)]
+    assert queued == [1000, 1001, 1002]
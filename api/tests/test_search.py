@@ -0,0 +1,14 @@
+import pytest
+from fastapi import HTTPException
+from app.routes import search
+from app.routes.search import resolve_folder
+
+def test_resolve_folder_stays_below_the_client_data_root(monkeypatch):
+    monkeypatch.setattr(search, "BASE_PATH", "/data/client")
+    assert resolve_folder(None) is None
+    assert resolve_folder("Company A/Project 1/") == "/data/client/Company A/Project 1"
+    assert resolve_folder(".") == "/data/client"
+    for outside in ("../client2", "../client2/Company A", "/etc", "Company A/../../.."):
+        with pytest.raises(HTTPException) as error:
+            resolve_folder(outside)
+        assert error.value.status_code == 400
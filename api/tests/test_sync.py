@@ -0,0 +1,41 @@
+import pytest
+from app import tasks
+
+@pytest.fixture
+def counts(monkeypatch):
+    """Record the folder count updates of sync_folders_task instead of writing them to Postgres."""
+    calls = {"deltas": {}, "recounted": []}
+    known = {}
+    monkeypatch.setattr(tasks, "get_document_fingerprints_in_folder", lambda path, recursive: known)
+    monkeypatch.setattr(tasks, "adjust_folder_counts", lambda deltas: calls["deltas"].update(deltas) or list(deltas))
+    monkeypatch.setattr(tasks, "recount_folders_in_subtree", lambda path: calls["recounted"].append(path) or [path])
+    for name in ("insert_documents_batch", "delete_documents_by_path", "update_job", "invalidate_documents",
+                 "invalidate_folders", "create_job"):
+        monkeypatch.setattr(tasks, name, lambda *args, **kwargs: 0)
+    monkeypatch.setattr(tasks.fingerprint_folder_task, "delay", lambda *args: None)
+    monkeypatch.setattr(tasks.embed_folder_task, "delay", lambda *args: None)
+    return calls, known
+
+def test_a_deleted_directory_is_recounted_and_moves_the_folders_above(tmp_path, counts):
+    calls, known = counts
+    gone = tmp_path / "gone"
+    known.update({str(gone / "sub" / "a.docx"): (1, 1, 1), str(gone / "b.docx"): (1, 1, 2)})
+
+    tasks.sync_folders_task([(str(gone), True)])
+
+    assert calls["recounted"] == [str(gone)]
+    assert calls["deltas"][str(tmp_path)] == -2
+    assert str(gone) not in calls["deltas"]
+
+def test_a_new_file_moves_the_counts_of_an_ingested_folder_only(tmp_path, counts):
+    calls, known = counts
+    (tmp_path / "new.docx").write_bytes(b"x")
+    (tmp_path / "old.docx").write_bytes(b"x")
+
+    tasks.sync_folders_task([(str(tmp_path), False)])  # never ingested: old.docx was counted already
+    assert calls["deltas"] == {}
+
+    known[str(tmp_path / "old.docx")] = (0, 0, 0)
+    tasks.sync_folders_task([(str(tmp_path), False)])
+    assert calls["deltas"][str(tmp_path)] == 1
+    assert calls["recounted"] == []
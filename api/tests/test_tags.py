@@ -0,0 +1,18 @@
+from app.tags import TagVocabulary, normalize_tag
+
+VOCABULARY = TagVocabulary({"HR": 1, "Contracts & Agreements": 2, "Invoices": 3}, version="v1")
+
+def test_normalize_tag():
+    assert normalize_tag("  HR-documents ") == "hr documents"
+    assert normalize_tag("Contracts&Agreements") == "contracts and agreements"
+
+def test_match_exact_normalized_fuzzy_and_unknown():
+    assert VOCABULARY.match("HR") == "HR"
+    assert VOCABULARY.match("contracts and agreements") == "Contracts & Agreements"
+    assert VOCABULARY.match("Invoice") == "Invoices"
+    assert VOCABULARY.match("Recipes") is None
+
+def test_resolve_drops_unknown_names_and_duplicates():
+    assert VOCABULARY.resolve(["hr", "HR", "Recipes", 3, "invoices"]) == ["HR", "Invoices"]
+    assert VOCABULARY.resolve(None) == []
+    assert VOCABULARY.tag_ids(["Invoices", "hr"]) == [3, 1]
@@ -0,0 +1,49 @@
+import pytest
+from app import watcher
+from app.watcher import ChangeBatcher
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(watcher.time, "monotonic", lambda: now[0])
+    return now
+
+def test_take_waits_for_the_debounce(clock):
+    batcher = ChangeBatcher(debounce=2, max_delay=30)
+    batcher.add("/root/a")
+    assert batcher.take() == []
+    clock[0] += 2
+    assert batcher.take() == [("/root/a", False)]
+    assert batcher.take() == []
+
+def test_take_sends_a_steady_stream_after_max_delay(clock):
+    batcher = ChangeBatcher(debounce=2, max_delay=5)
+    for _ in range(4):  # an event every second never lets the debounce pass
+        batcher.add("/root/a")
+        clock[0] += 1
+        assert batcher.take() == []
+    batcher.add("/root/b")
+    clock[0] += 1  # the first event is max_delay old
+    assert batcher.take() == [("/root/a", False), ("/root/b", False)]
+
+def test_take_coalesces_folders_below_a_recursive_one(clock):
+    batcher = ChangeBatcher(debounce=0)
+    batcher.add("/root/a/b")
+    batcher.add("/root/a")
+    batcher.add("/root/a", recursive=True)
+    batcher.add("/root/a")  # a later non-recursive event keeps the folder recursive
+    batcher.add("/root/ab")
+    assert batcher.take() == [("/root/a", True), ("/root/ab", False)]
+
+def test_poll_changes_syncs_folders_without_files_before_recursively(tmp_path, clock):
+    (tmp_path / "old").mkdir()
+    (tmp_path / "old" / "a.docx").write_bytes(b"x")
+    previous = watcher.snapshot(str(tmp_path))
+    (tmp_path / "old" / "b.docx").write_bytes(b"x")
+    (tmp_path / "new").mkdir()
+    (tmp_path / "new" / "c.docx").write_bytes(b"x")
+
+    batcher = ChangeBatcher(debounce=0)
+    watcher.poll_changes(str(tmp_path), previous, batcher)
+
+    assert batcher.take() == [(str(tmp_path / "new"), True), (str(tmp_path / "old"), False)]